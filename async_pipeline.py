@@ -0,0 +1,257 @@
+import os
+import time
+import asyncio
+import logging
+
+# Optional dependency: the async runners are only used when it is installed
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+import domain_email_cache
+import domains
+import email_score
+import fetch_pool
+import google_cse
+import http_client
+import metrics
+import page_cache
+import rate_limit
+import urls
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Opt in with ASYNC_PIPELINE=1; needs `httpx` in the deployment package
+ASYNC_PIPELINE = os.getenv("ASYNC_PIPELINE", "0") == "1"
+
+# Requests in flight at once across the whole run
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "200"))
+
+
+def enabled() -> bool:
+    """True when the async runners should be used instead of the threaded ones."""
+    if not ASYNC_PIPELINE:
+        return False
+    if httpx is None:
+        logger.warning("ASYNC_PIPELINE=1 but httpx is not installed; using the threaded runner")
+        return False
+    return True
+
+
+async def gather_until(coros: dict, deadline: float) -> dict:
+    """
+    Await {key: coroutine} concurrently until the monotonic deadline.
+    Returns {key: result} for the ones that finished; failures and
+    unfinished ones are left out (same contract as fetch_pool.fetch_all).
+    """
+    if not coros:
+        return {}
+
+    tasks = {asyncio.ensure_future(coro): key for key, coro in coros.items()}
+    done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"Fetch deadline reached: {len(pending)} of {len(tasks)} URLs unfinished")
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    for task in done:
+        key = tasks[task]
+        if task.exception() is not None:
+            logger.warning(f"Fetch coroutine failed for {key}: {task.exception()}")
+            continue
+        results[key] = task.result()
+    return results
+
+
+class AsyncFetcher:
+    """
+    One httpx.AsyncClient plus the same limits the threaded path uses:
+    a global in-flight semaphore, FETCH_PER_HOST_LIMIT per host, the
+    per-host token buckets, the CSE cache/quota and the byte cap.
+    """
+
+    def __init__(self, max_in_flight: int = ASYNC_MAX_IN_FLIGHT):
+        self.client = httpx.AsyncClient(
+            headers=http_client.DEFAULT_HEADERS,
+            timeout=http_client.DEFAULT_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_in_flight,
+                max_keepalive_connections=http_client.HTTP_POOL_MAXSIZE,
+            ),
+        )
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.host_limits = {}
+        self.domain_locks = {}
+        self.stats = {"requests": 0, "bytes_read": 0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.aclose()
+        logger.info(f"Async fetcher stats: {self.stats}")
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = domains.host_key(url)
+        sem = self.host_limits.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(fetch_pool.FETCH_PER_HOST_LIMIT)
+            self.host_limits[host] = sem
+        return sem
+
+    # ---------------------------------------------------
+    # Google CSE
+    # ---------------------------------------------------
+    async def search(self, query: str, start: int = 1, num: int = 10) -> list:
+        """google_cse.search as a coroutine (cache and quota included)."""
+        items = await asyncio.to_thread(google_cse.cached_items, query, start, num)
+        if items is not None:
+            return items
+
+        await asyncio.to_thread(google_cse.reserve_call)
+
+        with metrics.timed("search"):
+            async with self.in_flight:
+                await rate_limit.wait_turn_async(google_cse.CSE_ENDPOINT)
+                self.stats["requests"] += 1
+                resp = await self.client.get(
+                    google_cse.CSE_ENDPOINT,
+                    params=google_cse.request_params(query, start, num),
+                )
+            rate_limit.note_response(google_cse.CSE_ENDPOINT, resp.status_code, resp.headers)
+            resp.raise_for_status()
+        metrics.add_bytes("search", len(resp.content))
+        items = urls.canonical_items(resp.json().get("items", []))
+
+        await asyncio.to_thread(google_cse.store_items, query, start, num, items)
+        return items
+
+    async def search_pages(self, query: str, pages: int | None = None, num: int = 10,
+                           known_links=None) -> list:
+        """google_cse.iter_results as a coroutine: pages in order, same early stop."""
+        results = []
+        for start in google_cse.page_starts(pages, num):
+            try:
+                items = await self.search(query, start=start, num=num)
+            except Exception as e:
+                if start == 1:
+                    raise
+                logger.warning(f"[google_cse] Stopping pagination for '{query}' at start={start}: {e}")
+                break
+
+            results.extend(items)
+            if await asyncio.to_thread(google_cse.is_last_page, query, start, num, items, known_links):
+                break
+        return results
+
+    # ---------------------------------------------------
+    # Page fetches
+    # ---------------------------------------------------
+    async def scan_emails(self, url: str, first_match: bool = False) -> list:
+        """
+        Stream a page (capped at FETCH_MAX_BYTES) and scan it for emails,
+        revalidating against the stored copy like page_cache.scan_emails.
+        """
+        entry = await asyncio.to_thread(page_cache.lookup, url, first_match)
+        scan = page_cache.PageScan(url, entry, first_match)
+
+        with metrics.timed("fetch"):
+            async with self.in_flight, self._host_limit(url):
+                await rate_limit.wait_turn_async(url)
+                self.stats["requests"] += 1
+                async with self.client.stream("GET", url, headers=page_cache.conditional_headers(entry)) as resp:
+                    rate_limit.note_response(url, resp.status_code, resp.headers)
+                    # Before raise_for_status: httpx treats 304 as an error
+                    if resp.status_code == 304:
+                        return page_cache.reuse(url, entry) if entry is not None else []
+                    resp.raise_for_status()
+
+                    content_type = resp.headers.get("Content-Type", "")
+                    if content_type and "html" not in content_type.lower():
+                        logger.info(f"Skipping non-HTML content ({content_type}) at {url}")
+                        return []
+
+                    decoder = http_client.text_decoder(resp.encoding)
+                    remaining = http_client.FETCH_MAX_BYTES
+                    async for chunk in resp.aiter_bytes(http_client.FETCH_CHUNK_SIZE):
+                        chunk = chunk[:remaining]
+                        remaining -= len(chunk)
+                        self.stats["bytes_read"] += len(chunk)
+                        metrics.add_bytes("fetch", len(chunk))
+                        scan.feed(decoder.decode(chunk))
+                        if scan.done or remaining <= 0:
+                            break
+                    else:
+                        scan.feed(decoder.decode(b"", final=True))
+                    validators = resp.headers
+
+            emails = scan.finish()
+            await asyncio.to_thread(scan.save, validators, emails)
+            return emails
+
+    async def early_emails(self, url: str) -> list:
+        """Emails found before a first_match scan stops (see email_extract)."""
+        try:
+            return await self.scan_emails(url, first_match=True)
+        except Exception as e:
+            logger.warning(f"Error fetching HTML from {url}: {e}")
+            return []
+
+    async def first_email(self, url: str) -> str | None:
+        return email_score.best_email(url, await self.early_emails(url))
+
+    async def all_emails(self, url: str) -> list:
+        try:
+            return await self.scan_emails(url)
+        except Exception as e:
+            logger.warning(f"Error fetching HTML from {url}: {e}")
+            return []
+
+    # ---------------------------------------------------
+    # Domain fallback (same cache as the threaded path)
+    # ---------------------------------------------------
+    async def domain_fallback_email(self, domain: str, num: int = 3) -> str | None:
+        cached = await asyncio.to_thread(domain_email_cache.get, domain)
+        if cached is not None:
+            metrics.count("fallback", "cache_hits")
+            return cached.get("email")
+
+        lock = self.domain_locks.setdefault(domain.lower(), asyncio.Lock())
+        async with lock:
+            cached = await asyncio.to_thread(domain_email_cache.get, domain)
+            if cached is not None:
+                metrics.count("fallback", "cache_hits")
+                return cached.get("email")
+
+            fallback_query = f'site:{domain} "email" "contact"'
+            logger.info(f"Fallback search on domain: {domain} with query: {fallback_query}")
+            with metrics.timed("fallback"):
+                try:
+                    items = await self.search(fallback_query, num=num)
+                except Exception as e:
+                    logger.warning(f"Error in fallback domain search for {domain}: {e}")
+                    metrics.count("fallback", "search_failed")
+                    return None
+
+                email = None
+                for item in items:
+                    link = item.get("link")
+                    if not link:
+                        continue
+                    email = await self.first_email(link)
+                    if email:
+                        break
+
+            metrics.count("fallback", "found" if email else "not_found")
+            await asyncio.to_thread(domain_email_cache.put, domain, email)
+            return email
@@ -0,0 +1,99 @@
+"""
+Email extraction microbenchmark: MB/s of email_extract on real pages,
+against the single findall the agents used before.
+
+    python benchmarks/extract_throughput.py saved_pages/            # *.html files
+    python benchmarks/extract_throughput.py https://www.example.edu/contact
+    python benchmarks/extract_throughput.py                          # synthetic pages
+
+Save a few campus pages first (e.g. `curl -o saved_pages/x.html <url>`)
+so the numbers reflect real markup; URLs are fetched once before timing.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_extract  # noqa: E402
+from fakes import make_page  # noqa: E402
+
+# The pattern the agents used before email_extract ranked and de-obfuscated
+OLD_EMAIL_REGEX = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+
+def load_pages(sources: list) -> list:
+    """[(name, text)] from files, directories of *.htm(l) files and URLs."""
+    pages = []
+    for source in sources:
+        if source.startswith(("http://", "https://")):
+            import http_client
+            resp = http_client.get(source, timeout=15)
+            resp.raise_for_status()
+            pages.append((source, resp.text))
+        elif os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                if name.lower().endswith((".html", ".htm")):
+                    pages.extend(load_pages([os.path.join(source, name)]))
+        else:
+            with open(source, encoding="utf-8", errors="replace") as f:
+                pages.append((source, f.read()))
+    return pages
+
+
+def synthetic_pages(count: int = 20) -> list:
+    return [
+        (f"synthetic-{i}", make_page(f"bench{i}", 80_000, i % 4, f"campus{i}").decode("utf-8"))
+        for i in range(count)
+    ]
+
+
+def throughput(fn, pages: list, min_seconds: float) -> float:
+    """MB/s of fn(text) over all pages, repeated for at least min_seconds."""
+    total = sum(len(text) for _, text in pages)
+    rounds = 0
+    started = time.perf_counter()
+    while True:
+        for _, text in pages:
+            fn(text)
+        rounds += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return total * rounds / elapsed / 1e6
+
+
+def chunked(text: str, size: int = 64 * 1024):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="*", help="HTML files, directories or URLs")
+    parser.add_argument("--seconds", type=float, default=2.0, help="minimum time per measurement")
+    parser.add_argument("--show", action="store_true", help="print the ranked addresses per page")
+    args = parser.parse_args()
+
+    pages = load_pages(args.sources) if args.sources else synthetic_pages()
+    if not pages:
+        raise SystemExit("No pages to measure")
+    total = sum(len(text) for _, text in pages)
+    print(f"{len(pages)} pages, {total / 1e6:.2f} MB of text")
+
+    if args.show:
+        for name, text in pages:
+            print(f"  {name}: {email_extract.extract_emails(text)[:5]}")
+
+    measurements = [
+        ("old findall", OLD_EMAIL_REGEX.findall),
+        ("email_extract.extract", email_extract.extract),
+        ("email_extract.scan_chunks (64 KiB)", lambda text: email_extract.scan_chunks(chunked(text))),
+        ("scan_chunks first_match", lambda text: email_extract.scan_chunks(chunked(text), first_match=True)),
+    ]
+    for label, fn in measurements:
+        print(f"{label:38s} {throughput(fn, pages, args.seconds):8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
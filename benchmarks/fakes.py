@@ -0,0 +1,294 @@
+"""
+Local stand-ins for the services the agents talk to:
+
+- FakeCSEServer:   Google Custom Search JSON API with canned `items`
+- FakeSiteServer:  campus websites with configurable latency, page size,
+                   email density and ETag support
+- FakeTable:       in-memory DynamoDB table (the calls lead_store,
+                   id_index and the agents make)
+"""
+import json
+import random
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import botocore.exceptions
+
+
+# ---------------------------------------------------
+# HTTP servers
+# ---------------------------------------------------
+class _Server:
+    """ThreadingHTTPServer on 127.0.0.1 (random port) in a daemon thread."""
+
+    def __init__(self, handler_class):
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def count(self, nbytes: int):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += nbytes
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.owner.count(len(body))
+
+
+class FakeCSEServer(_Server):
+    """
+    Answers /customsearch/v1?q=&start=&num= with `num` items per page.
+    Links point at the given site servers; each query maps onto a window
+    of `pages_per_site` paths, so different queries overlap like real
+    searches do. With url_variants=True links come with tracking
+    parameters, fragments or index.html the way Google returns them.
+    """
+
+    VARIANTS = ("", "?utm_source=google&utm_medium=cpc", "#contact", "index.html", "?gclid=abc123")
+
+    def __init__(self, sites: list, pages_per_site: int = 50, latency: float = 0.05,
+                 url_variants: bool = False):
+        self.sites = sites
+        self.pages_per_site = pages_per_site
+        self.latency = latency
+        self.url_variants = url_variants
+        super().__init__(_CSEHandler)
+
+    @property
+    def endpoint(self) -> str:
+        return self.base_url + "/customsearch/v1"
+
+    def items(self, query: str, start: int, num: int) -> list:
+        seed = int(hashlib.sha256(query.encode("utf-8")).hexdigest()[:8], 16)
+        items = []
+        for i in range(start - 1, start - 1 + num):
+            n = seed + i
+            site = self.sites[n % len(self.sites)]
+            page = (n // len(self.sites)) % self.pages_per_site
+            variant = self.VARIANTS[(seed + start) % len(self.VARIANTS)] if self.url_variants else ""
+            items.append({
+                "link": f"{site.base_url}/events/page-{page}/{variant}",
+                "title": f"Leadership event {page}",
+                "snippet": f"Result {i + 1} for {query}",
+            })
+        return items
+
+
+class _CSEHandler(_QuietHandler):
+    def do_GET(self):
+        owner = self.server.owner
+        time.sleep(owner.latency)
+        params = parse_qs(urlparse(self.path).query)
+        query = params.get("q", [""])[0]
+        start = int(params.get("start", ["1"])[0])
+        num = int(params.get("num", ["10"])[0])
+        body = json.dumps({"items": owner.items(query, start, num)}).encode("utf-8")
+        self.send_body(200, body, "application/json")
+
+
+class FakeSiteServer(_Server):
+    """
+    Serves deterministic HTML pages of about `page_size` bytes with
+    `emails_per_page` addresses in a mix of forms (plain, mailto:,
+    "[at]", Cloudflare). With etag=True it honours If-None-Match.
+    """
+
+    def __init__(self, name: str, latency: float = 0.1, page_size: int = 60_000,
+                 emails_per_page: int = 2, etag: bool = True):
+        self.name = name
+        self.latency = latency
+        self.page_size = page_size
+        self.emails_per_page = emails_per_page
+        self.etag = etag
+        self.not_modified = 0
+        self._pages = {}
+        super().__init__(_SiteHandler)
+
+    def page(self, path: str) -> bytes:
+        body = self._pages.get(path)
+        if body is None:
+            body = make_page(f"{self.name}{path}", self.page_size, self.emails_per_page, self.name)
+            self._pages[path] = body
+        return body
+
+
+class _SiteHandler(_QuietHandler):
+    def do_GET(self):
+        owner = self.server.owner
+        time.sleep(owner.latency)
+        body = owner.page(urlparse(self.path).path)
+        tag = '"' + hashlib.md5(body).hexdigest() + '"'
+
+        if owner.etag and self.headers.get("If-None-Match") == tag:
+            with owner.lock:
+                owner.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            owner.count(0)
+            return
+
+        headers = {"ETag": tag} if owner.etag else {}
+        self.send_body(200, body, "text/html; charset=utf-8", headers)
+
+
+_FILLER = (
+    "<p>The Office of Student Life hosts leadership retreats, officer training "
+    "and speaker series for student organizations across campus.</p>\n"
+    "<div class=\"nav-item\"><a href=\"/events/calendar\">Events</a></div>\n"
+    "<script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);}</script>\n"
+)
+
+
+def cfemail(address: str, key: int = 0x5a) -> str:
+    return f"{key:02x}" + "".join(f"{ord(c) ^ key:02x}" for c in address)
+
+
+def make_page(seed: str, size: int, emails: int, domain: str) -> bytes:
+    """An HTML page of about `size` bytes with `emails` addresses spread through it."""
+    rng = random.Random(seed)
+    blocks = max(1, size // len(_FILLER))
+    forms = [
+        lambda a: f'<a href="mailto:{a}">{a}</a>',
+        lambda a: f"<p>Contact: {a}</p>",
+        lambda a: "<p>{} [at] {}</p>".format(*a.split("@")),
+        lambda a: f'<a href="/cdn-cgi/l/email-protection" class="__cf_email__" data-cfemail="{cfemail(a)}">[email&#160;protected]</a>',
+    ]
+    placed = {rng.randrange(blocks): i for i in range(emails)}
+    parts = ["<html><head><title>Campus events</title></head><body>\n"]
+    for block in range(blocks):
+        parts.append(_FILLER)
+        if block in placed:
+            address = f"office{placed[block]}@{domain}.edu"
+            parts.append(forms[rng.randrange(len(forms))](address) + "\n")
+    parts.append("</body></html>\n")
+    return "".join(parts).encode("utf-8")
+
+
+# ---------------------------------------------------
+# DynamoDB stand-in
+# ---------------------------------------------------
+class _FakeClient:
+    def __init__(self, tables: dict):
+        self.tables = tables
+
+    def batch_get_item(self, RequestItems: dict) -> dict:
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.tables[name]
+            found = []
+            for key in request["Keys"]:
+                item_id = key["id"]["S"]
+                with table.lock:
+                    exists = item_id in table.items
+                    table.ops["batch_get_keys"] += 1
+                if exists:
+                    found.append({"id": {"S": item_id}})
+            responses[name] = found
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class _BatchWriter:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def put_item(self, Item: dict):
+        with self.table.lock:
+            self.table.items[Item["id"]] = dict(Item)
+            self.table.ops["batch_writes"] += 1
+
+
+class FakeTable:
+    """
+    In-memory table keyed on `id` with the calls the agents make:
+    get_item, put_item (incl. attribute_not_exists(id)), batch_writer,
+    scan, delete_item and meta.client.batch_get_item.
+    """
+
+    _tables = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = {}
+        self.lock = threading.Lock()
+        self.ops = {"get_item": 0, "put_item": 0, "batch_writes": 0, "batch_get_keys": 0, "scan": 0}
+        FakeTable._tables[name] = self
+        self.meta = _Meta(_FakeClient(FakeTable._tables))
+
+    def get_item(self, Key: dict, **kwargs) -> dict:
+        with self.lock:
+            self.ops["get_item"] += 1
+            item = self.items.get(Key["id"])
+        return {"Item": dict(item)} if item is not None else {}
+
+    def put_item(self, Item: dict, ConditionExpression: str | None = None, **kwargs):
+        with self.lock:
+            self.ops["put_item"] += 1
+            if ConditionExpression == "attribute_not_exists(id)" and Item["id"] in self.items:
+                raise botocore.exceptions.ClientError(
+                    {"Error": {"Code": "ConditionalCheckFailedException", "Message": "exists"}},
+                    "PutItem",
+                )
+            self.items[Item["id"]] = dict(Item)
+        return {}
+
+    def delete_item(self, Key: dict, **kwargs):
+        with self.lock:
+            self.items.pop(Key["id"], None)
+        return {}
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self)
+
+    def scan(self, ProjectionExpression: str | None = None, **kwargs) -> dict:
+        with self.lock:
+            self.ops["scan"] += 1
+            items = list(self.items.values())
+        if ProjectionExpression == "id":
+            items = [{"id": item["id"]} for item in items]
+        return {"Items": items}
@@ -0,0 +1,165 @@
+"""
+End-to-end benchmark: runs the agents against local fakes (see fakes.py)
+and reports wall time, requests/s and bytes fetched per saved lead.
+
+    python benchmarks/run_e2e.py
+    python benchmarks/run_e2e.py --sites 8 --latency 0.2 --page-size 120000 --async
+    python benchmarks/run_e2e.py --agents backup:student_athlete_leadership_agent,truck,sga
+
+Nothing leaves the machine: Google CSE, the campus sites and DynamoDB are
+all stand-ins. State (CSE cache, page validators, domain cache) goes to a
+temporary STATE_FILE, so every run starts cold unless --state-file is given.
+Per-host politeness limits are lifted by default (--polite keeps them).
+--metrics-file records the same per-stage metrics the Lambdas emit.
+"""
+import os
+import sys
+import time
+import argparse
+import importlib
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import FakeCSEServer, FakeSiteServer, FakeTable  # noqa: E402
+
+DEFAULT_AGENTS = "backup:student_athlete_leadership_agent,backup:men_of_color_initiative_agent,truck,sga"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", default=DEFAULT_AGENTS,
+                        help="comma-separated: backup:<agent_name>, truck, sga")
+    parser.add_argument("--sites", type=int, default=6, help="fake campus sites (one port/host each)")
+    parser.add_argument("--pages-per-site", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per site response")
+    parser.add_argument("--cse-latency", type=float, default=0.05)
+    parser.add_argument("--page-size", type=int, default=60_000, help="bytes per page")
+    parser.add_argument("--emails-per-page", type=int, default=2)
+    parser.add_argument("--no-etag", action="store_true", help="sites don't send validators")
+    parser.add_argument("--url-variants", action="store_true",
+                        help="search links carry tracking params, fragments and index.html")
+    parser.add_argument("--rounds", type=int, default=1, help="run the agents this many times on one state")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="ASYNC_PIPELINE=1")
+    parser.add_argument("--polite", action="store_true", help="keep the default per-host rate limits")
+    parser.add_argument("--state-file", default="")
+    parser.add_argument("--metrics-file", default="",
+                        help="append per-agent/stage metrics (EMF JSON lines, see metrics.py) here")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args()
+
+
+def configure_env(args, cse: FakeCSEServer, state_dir: str):
+    """Point every module at the fakes; must run before the agents are imported."""
+    os.environ.update({
+        "GOOGLE_API_KEY": "benchmark",
+        "GOOGLE_CX": "benchmark",
+        "CSE_ENDPOINT": cse.endpoint,
+        "CSE_DAILY_QUOTA": "0",
+        "STATE_BACKEND": "file",
+        "STATE_FILE": args.state_file or os.path.join(state_dir, "state.json"),
+        "DDB_TABLE_NAME": "benchmark-sga-leads",
+        "ID_INDEX_SOURCE": "scan",
+        "CHECKPOINT_REINVOKE": "0",
+        "ASYNC_PIPELINE": "1" if args.use_async else "0",
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+        "METRICS_MODE": "file" if args.metrics_file else "off",
+        "METRICS_FILE": args.metrics_file,
+    })
+    if not args.polite:
+        os.environ.setdefault("HOST_RATE_PER_SECOND", "1000")
+        os.environ.setdefault("HOST_BURST", "1000")
+
+
+def load_agents(spec: str) -> list:
+    """[(label, run)] with each module's table swapped for a FakeTable."""
+    modules = {}
+    tables = {}
+
+    def module(name: str):
+        if name not in modules:
+            mod = importlib.import_module(name)
+            # Modules naming the same table share it, as they do in AWS
+            if mod.table.name not in tables:
+                tables[mod.table.name] = FakeTable(mod.table.name)
+            mod.table = tables[mod.table.name]
+            modules[name] = mod
+        return modules[name]
+
+    runs = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if entry.startswith("backup:"):
+            agent_name = entry.split(":", 1)[1]
+            backup = module("lambda_backup_DEC06")
+            runs.append((entry, lambda a=agent_name, m=backup: m.run_agent(a)))
+        elif entry == "truck":
+            runs.append((entry, module("lambda").run_truck_esl_agent))
+        elif entry == "sga":
+            runs.append((entry, module("sga_lambda_function").run_agent))
+        elif entry:
+            raise SystemExit(f"Unknown agent spec: {entry}")
+    return runs
+
+
+def saved_count(result) -> int:
+    return result.get("saved", 0) if isinstance(result, dict) else int(result or 0)
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    sites = [
+        FakeSiteServer(f"campus{i}", latency=args.latency, page_size=args.page_size,
+                       emails_per_page=args.emails_per_page, etag=not args.no_etag).start()
+        for i in range(args.sites)
+    ]
+    cse = FakeCSEServer(sites, pages_per_site=args.pages_per_site, latency=args.cse_latency,
+                        url_variants=args.url_variants).start()
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        configure_env(args, cse, state_dir)
+        runs = load_agents(args.agents)
+        # The agent modules set the root logger to INFO on import
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        import http_client
+        import metrics
+
+        for round_no in range(1, args.rounds + 1):
+            print(f"--- round {round_no} ---")
+            for label, run in runs:
+                before_sites = sum(s.requests for s in sites), sum(s.bytes_sent for s in sites)
+                before_cse = cse.requests
+                started = time.perf_counter()
+                saved = saved_count(run())
+                elapsed = time.perf_counter() - started
+                metrics.flush()
+
+                site_requests = sum(s.requests for s in sites) - before_sites[0]
+                site_bytes = sum(s.bytes_sent for s in sites) - before_sites[1]
+                cse_requests = cse.requests - before_cse
+                per_lead = f"{site_bytes / saved / 1024:.1f} KiB" if saved else "-"
+                print(
+                    f"{label:55s} {elapsed:7.2f}s  saved={saved:4d}  "
+                    f"cse={cse_requests:3d}  pages={site_requests:4d}  "
+                    f"req/s={(site_requests + cse_requests) / elapsed:7.1f}  "
+                    f"MiB={site_bytes / 1024 / 1024:7.2f}  bytes/lead={per_lead}"
+                )
+
+        print(f"304 responses: {sum(s.not_modified for s in sites)}")
+        print(f"http_client: {http_client.connection_stats()}")
+        if args.metrics_file:
+            print(f"Metrics appended to {args.metrics_file}")
+
+    cse.stop()
+    for site in sites:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
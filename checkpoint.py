@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+import boto3
+import botocore.exceptions
+
+import fetch_pool
+import state_store
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Stop fetching this long before Lambda would kill the run, leaving time
+# to save what was found, write the cursor and re-invoke
+CHECKPOINT_MARGIN_SECONDS = int(os.getenv("CHECKPOINT_MARGIN_SECONDS", "60"))
+
+# Continue an unfinished run in a fresh async invocation (otherwise the
+# next scheduled run picks the cursor up)
+CHECKPOINT_REINVOKE = os.getenv("CHECKPOINT_REINVOKE", "1") == "1"
+
+# Most re-invocations in one chain, so a run that never finishes can't
+# keep invoking itself
+CHECKPOINT_MAX_CHAIN = int(os.getenv("CHECKPOINT_MAX_CHAIN", "4"))
+
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(2 * 24 * 3600)))
+
+
+def run_key(agent_names: list) -> str:
+    """State key for the cursor of a run over these agents."""
+    raw = json.dumps(list(agent_names))
+    return "checkpoint#" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def load(key: str) -> dict | None:
+    """
+    Saved cursor, or None. A cursor looks like
+    {"agent": name, "query_index": i, "result_index": j}: the first search
+    result (by position in the agent's query/result order) not yet done.
+    """
+    return state_store.get_store().get(key)
+
+
+def save(key: str, cursor: dict):
+    logger.info(f"[checkpoint] Saving cursor {cursor}")
+    state_store.get_store().put(key, cursor, ttl=CHECKPOINT_TTL_SECONDS)
+
+
+def clear(key: str):
+    state_store.get_store().delete(key)
+
+
+def position(cursor: dict | None) -> tuple:
+    """(query_index, result_index) to resume an agent from; (0, 0) for a fresh run."""
+    if not cursor:
+        return (0, 0)
+    return (int(cursor.get("query_index", 0)), int(cursor.get("result_index", 0)))
+
+
+def make_deadline(context=None) -> float:
+    """
+    Monotonic fetch deadline: the usual FETCH_DEADLINE_SECONDS, cut short
+    to CHECKPOINT_MARGIN_SECONDS before the Lambda timeout.
+    """
+    deadline = fetch_pool.make_deadline()
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return deadline
+    left = context.get_remaining_time_in_millis() / 1000 - CHECKPOINT_MARGIN_SECONDS
+    return min(deadline, time.monotonic() + max(0.0, left))
+
+
+def reinvoke(context, event: dict) -> bool:
+    """
+    Invoke this same function asynchronously with `event` to continue the
+    run. Returns False (cursor stays for the next scheduled run) when
+    disabled, the chain limit is reached or the invoke fails, and without
+    a shared state store: the new invocation would not see the cursor and
+    would start over.
+    """
+    if not CHECKPOINT_REINVOKE or context is None:
+        return False
+    if not state_store.is_shared():
+        logger.error(
+            "[checkpoint] Not re-invoking: the cursor is in this container's state file, "
+            "which the next invocation can't read. Set STATE_TABLE_NAME to resume across invocations."
+        )
+        return False
+
+    chain = int(event.get("chain", 0)) + 1
+    if chain > CHECKPOINT_MAX_CHAIN:
+        logger.warning(f"[checkpoint] Chain limit {CHECKPOINT_MAX_CHAIN} reached; next scheduled run resumes")
+        return False
+
+    payload = dict(event, chain=chain)
+    try:
+        boto3.client("lambda").invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType="Event",
+            Payload=json.dumps(payload).encode("utf-8"),
+        )
+    except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
+        logger.error(f"[checkpoint] Re-invoke failed: {e}")
+        return False
+
+    logger.info(f"[checkpoint] Re-invoked {context.function_name} (chain {chain})")
+    return True
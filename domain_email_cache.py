@@ -0,0 +1,50 @@
+import os
+import logging
+import threading
+
+import state_store
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# A school's contact email rarely changes; "no email found" is retried sooner
+DOMAIN_EMAIL_TTL_SECONDS = int(os.getenv("DOMAIN_EMAIL_TTL_SECONDS", str(30 * 24 * 3600)))
+DOMAIN_EMAIL_NEGATIVE_TTL_SECONDS = int(os.getenv("DOMAIN_EMAIL_NEGATIVE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_domain_locks = {}
+_domain_locks_lock = threading.Lock()
+
+
+def _key(domain: str) -> str:
+    return "domain-email#" + domain.lower()
+
+
+def lock_for(domain: str) -> threading.Lock:
+    """Lock so only one thread runs the fallback search for a domain at a time."""
+    with _domain_locks_lock:
+        lock = _domain_locks.get(domain.lower())
+        if lock is None:
+            lock = threading.Lock()
+            _domain_locks[domain.lower()] = lock
+        return lock
+
+
+def get(domain: str) -> dict | None:
+    """
+    Cached fallback result for a domain, or None if it was never looked up
+    (or the entry expired). A hit is {"email": str | None}; email None is a
+    cached "no email found".
+    """
+    if not domain:
+        return None
+    return state_store.get_store().get(_key(domain))
+
+
+def put(domain: str, email: str | None):
+    ttl = DOMAIN_EMAIL_TTL_SECONDS if email else DOMAIN_EMAIL_NEGATIVE_TTL_SECONDS
+    state_store.get_store().put(_key(domain), {"email": email}, ttl=ttl)
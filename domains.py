@@ -0,0 +1,194 @@
+import os
+import logging
+import ipaddress
+from functools import lru_cache
+from urllib.parse import urlparse
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Full public suffix list (publicsuffix.org format) to use instead of the
+# bundled subset, e.g. a public_suffix_list.dat shipped in the zip
+PUBLIC_SUFFIX_FILE = os.getenv("PUBLIC_SUFFIX_FILE", "")
+
+# Distinct hosts remembered by registrable_domain
+DOMAIN_CACHE_SIZE = int(os.getenv("DOMAIN_CACHE_SIZE", "8192"))
+
+# ---------------------------------------------------
+# Bundled public suffixes
+# ---------------------------------------------------
+# The part of publicsuffix.org the agents run into: generic TLDs, the
+# academic/commercial second levels of the countries schools are in, US
+# state and K-12 domains, and hosting platforms where each subdomain is a
+# separate site. Any other TLD still counts as a public suffix on its own.
+_BUNDLED_RULES = """
+com net org edu gov mil int info biz io co ai app dev me us tv
+
+ac.uk co.uk gov.uk org.uk ltd.uk plc.uk me.uk net.uk sch.uk nhs.uk police.uk
+com.au edu.au gov.au org.au net.au asn.au id.au
+ac.nz co.nz govt.nz org.nz net.nz school.nz
+ab.ca bc.ca mb.ca nb.ca nl.ca ns.ca nt.ca nu.ca on.ca pe.ca qc.ca sk.ca yk.ca
+ac.jp co.jp go.jp or.jp ne.jp ed.jp
+ac.in co.in edu.in gov.in org.in res.in net.in
+ac.za co.za gov.za org.za edu.za
+com.br edu.br gov.br org.br net.br
+com.mx edu.mx gob.mx org.mx net.mx
+com.cn edu.cn gov.cn org.cn net.cn ac.cn
+ac.kr co.kr go.kr or.kr
+com.sg edu.sg gov.sg org.sg
+com.hk edu.hk gov.hk org.hk
+com.ph edu.ph gov.ph org.ph
+com.ng edu.ng gov.ng org.ng
+ac.ke co.ke or.ke
+ac.il co.il org.il
+com.tr edu.tr gov.tr org.tr
+ac.th co.th or.th go.th
+
+github.io githubusercontent.com blogspot.com herokuapp.com netlify.app
+vercel.app web.app firebaseapp.com appspot.com azurewebsites.net
+cloudfront.net wixsite.com
+"""
+
+_US_STATES = (
+    "ak al ar az ca co ct dc de fl ga hi ia id il in ks ky la ma md me mi mn mo ms mt "
+    "nc nd ne nh nj nm nv ny oh ok or pa ri sc sd tn tx ut va vt wa wi wv wy"
+).split()
+
+
+def _bundled_rules() -> list:
+    rules = _BUNDLED_RULES.split()
+    for state in _US_STATES:
+        rules += [f"{state}.us", f"k12.{state}.us", f"cc.{state}.us", f"lib.{state}.us"]
+    return rules
+
+
+def _file_rules(path: str) -> list:
+    rules = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("//"):
+                rules.append(line.split()[0])
+    return rules
+
+
+def _compile(rules: list) -> dict:
+    """
+    Trie of reversed labels: "co.uk" -> {"uk": {"co": {"$": True}}}.
+    "$" marks the end of a rule, "*" is a wildcard label and "!" marks an
+    exception rule ("!city.kawasaki.jp"), as in publicsuffix.org.
+    """
+    trie = {}
+    for rule in rules:
+        rule = rule.lower()
+        exception = rule.startswith("!")
+        node = trie
+        for label in reversed(rule.lstrip("!").split(".")):
+            node = node.setdefault(label, {})
+        node["!" if exception else "$"] = True
+    return trie
+
+
+def _load_trie() -> dict:
+    if PUBLIC_SUFFIX_FILE:
+        try:
+            return _compile(_file_rules(PUBLIC_SUFFIX_FILE))
+        except OSError as e:
+            logger.warning(f"Could not read PUBLIC_SUFFIX_FILE {PUBLIC_SUFFIX_FILE}: {e}; using bundled list")
+    return _compile(_bundled_rules())
+
+
+_TRIE = _load_trie()
+
+
+def _suffix_length(labels: list) -> int:
+    """Number of trailing labels that form the public suffix."""
+    node = _TRIE
+    length = 1  # unlisted TLDs are public suffixes too
+    for depth, label in enumerate(reversed(labels), 1):
+        child = node.get(label)
+        if child is not None and child.get("!"):
+            return depth - 1
+        if child is None:
+            child = node.get("*")
+        if child is None:
+            break
+        if child.get("$"):
+            length = depth
+        node = child
+    return length
+
+
+# ---------------------------------------------------
+# Normalization
+# ---------------------------------------------------
+def host_of(url: str) -> str:
+    """Lower-case host of a URL without port, credentials or trailing dot."""
+    try:
+        host = urlparse(url.strip()).hostname or ""
+    except ValueError:
+        return ""
+    return host.rstrip(".")
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def registrable_domain(host: str) -> str:
+    """
+    The domain a site registered: "www.mines.edu", "mines.edu:443" and
+    "students.mines.edu" -> "mines.edu"; "www.ox.ac.uk" -> "ox.ac.uk".
+    IP addresses, "localhost" and bare public suffixes come back unchanged.
+    """
+    host = host.strip().lower().rstrip(".")
+    if host.startswith("["):
+        return host.split("]")[0] + "]"
+    host = host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+    if not host or _is_ip(host) or "." not in host:
+        return host
+    labels = host.split(".")
+    keep = _suffix_length(labels) + 1
+    return host if keep > len(labels) else ".".join(labels[-keep:])
+
+
+def site_of(url: str) -> str:
+    """Registrable domain of a URL ("" when it has no host)."""
+    host = host_of(url)
+    return registrable_domain(host) if host else ""
+
+
+def same_site(a: str, b: str) -> bool:
+    """True when two URLs belong to the same registrable domain."""
+    site = site_of(a)
+    return bool(site) and site == site_of(b)
+
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def host_key(url: str) -> str:
+    """
+    Key for per-host scheduling (concurrency and rate limits): the
+    registrable domain, plus the port when it isn't the scheme's default,
+    since a different port is usually a different server.
+    """
+    try:
+        parsed = urlparse(url.strip())
+        port = parsed.port
+    except ValueError:
+        return ""
+    site = registrable_domain(parsed.hostname or "") if parsed.hostname else ""
+    if port is not None and port != _DEFAULT_PORTS.get(parsed.scheme.lower()):
+        return f"{site}:{port}"
+    return site
@@ -6,3 +6,25 @@ data "aws_dynamodb_table" "speaking_leads" {
   # Existing table created by the main speaking-leads project
   name = "speaking-leads-v3-multi"
 }
+
+#########################################
+# Agent state table (caches, counters)
+#########################################
+
+resource "aws_dynamodb_table" "agent_state" {
+  # Used by state_store.py: Google CSE cache and quota counters
+  name         = "speaking-agent-state"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "pk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  # Cache entries expire on their own
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
@@ -0,0 +1,259 @@
+import re
+from urllib.parse import unquote
+
+import email_score
+
+# ---------------------------------------------------
+# Email patterns
+# ---------------------------------------------------
+# Every trigger pattern starts with a literal or a small character class,
+# so the regex engine skips through the page at memchr-like speed and only
+# does real work where an address can start:
+#   "@"                 plain addresses (local part read backwards)
+#   "&#64;" / "&#x40;"  HTML-entity @
+#   "[at]" "(at)" ...   bracketed at, with optional "[dot]"s in the domain
+#   "mailto:"           href="mailto:a@b.edu?subject=..."
+#   "data-cfemail="     Cloudflare email protection, and its
+#   "/cdn-cgi/l/email-protection#" link form
+# One alternation of all of these would be several times slower in
+# Python's re, which can't skip ahead on a mixed alternation.
+_DOT = r"(?:\.|&\#0{0,2}46;|\s{0,3}[\[({]\s{0,3}dot\s{0,3}[\])}]\s{0,3})"
+_LABEL = r"[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?"
+_TLD = r"[a-z]{2,24}"
+_DOMAIN = rf"(?P<domain>{_LABEL}(?:{_DOT}{_LABEL}){{0,7}}{_DOT}{_TLD})(?![a-z0-9-])"
+
+_FLAGS = re.IGNORECASE | re.ASCII
+
+# (source, pattern); domain triggers have a "domain" group, the rest "value"
+TRIGGERS = (
+    ("text", re.compile("@" + _DOMAIN, _FLAGS)),
+    ("obfuscated", re.compile(r"&\#(?:0{0,2}64|x0{0,2}40);" + _DOMAIN, _FLAGS)),
+    ("obfuscated", re.compile(r"[\[({]\s{0,3}at\s{0,3}[\])}]\s{0,3}" + _DOMAIN, _FLAGS)),
+    # Case-sensitive so the literal prefix search stays fast; HTML uses lower case
+    ("mailto", re.compile(r"mailto:(?P<value>[^\"'<>\s?]{3,320})", re.ASCII)),
+    ("cfemail", re.compile(r"data-cfemail=[\"'](?P<value>[0-9a-fA-F]{4,512})[\"']", re.ASCII)),
+    ("cfemail", re.compile(r"/cdn-cgi/l/email-protection\#(?P<value>[0-9a-fA-F]{4,512})", re.ASCII)),
+)
+
+# Local part right before a domain trigger, anchored at both ends: it must
+# start a token and end at the trigger (bracketed "at" allows spaces)
+LOCAL_REGEX = re.compile(r"(?<![a-z0-9._%+-])(?P<local>[a-z0-9._%+-]{1,64})\Z", _FLAGS)
+LOCAL_SPACED_REGEX = re.compile(r"(?<![a-z0-9._%+-])(?P<local>[a-z0-9._%+-]{1,64})\s{0,3}\Z", _FLAGS)
+
+# A decoded candidate must match this in full
+ADDRESS_REGEX = re.compile(
+    r"[a-z0-9._%+-]{1,64}@" + _LABEL + r"(?:\." + _LABEL + r"){0,7}\." + _TLD,
+    _FLAGS,
+)
+
+_OBFUSCATED_DOT = re.compile(_DOT, _FLAGS)
+_PLAIN_DOMAIN = re.compile(r"[a-z0-9.-]+", _FLAGS)
+
+# "logo@2x.png" and friends look like addresses
+NON_TLDS = {"png", "jpg", "jpeg", "gif", "svg", "webp", "bmp", "ico", "css", "js", "pdf"}
+
+# Lower is better; a candidate keeps the best source it was seen with
+SOURCE_RANK = {"mailto": 0, "cfemail": 1, "text": 2, "obfuscated": 3}
+
+# Text kept from the end of one chunk so an address split across the
+# chunk boundary is still matched (a mailto: href is at most ~330 chars)
+CHUNK_OVERLAP = 512
+
+# A match ending this close to the end of a chunk could still grow
+# (e.g. "a@b.edu" + ".au", or " [dot] org"), so it waits for more text
+CHUNK_MATCH_SLACK = 24
+
+# first_match scans that have only a plain-text address keep reading this
+# many characters more, in case a mailto: link follows it
+FIRST_MATCH_GRACE = 64 * 1024
+
+
+class Candidate:
+    """One address found on a page, with where and how it was found."""
+
+    __slots__ = ("email", "source", "position", "count")
+
+    def __init__(self, email: str, source: str, position: int):
+        self.email = email
+        self.source = source
+        self.position = position
+        self.count = 1
+
+    @property
+    def rank(self) -> tuple:
+        return (SOURCE_RANK[self.source], self.position)
+
+    def __repr__(self):
+        return f"Candidate({self.email!r}, {self.source}, pos={self.position}, count={self.count})"
+
+
+def decode_cfemail(hex_string: str) -> str:
+    """Cloudflare's encoding: first byte is the XOR key for the rest."""
+    try:
+        data = bytes.fromhex(hex_string)
+    except ValueError:
+        return ""
+    if len(data) < 2:
+        return ""
+    key = data[0]
+    return bytes(b ^ key for b in data[1:]).decode("utf-8", "replace")
+
+
+def _valid(email: str) -> str | None:
+    email = email.strip().lower()
+    if not ADDRESS_REGEX.fullmatch(email):
+        return None
+    if email.rsplit(".", 1)[-1] in NON_TLDS:
+        return None
+    return email
+
+
+def _hit(buf: str, source: str, m: re.Match) -> tuple | None:
+    """(start, end, [(email, source)]) for one trigger match, or None."""
+    if source == "mailto":
+        found = [(_valid(a), source) for a in unquote(m.group("value")).split(",")]
+    elif source == "cfemail":
+        found = [(_valid(decode_cfemail(m.group("value"))), source)]
+    else:
+        local_regex = LOCAL_SPACED_REGEX if buf[m.start()] in "[({" else LOCAL_REGEX
+        local = local_regex.search(buf, max(0, m.start() - 68), m.start())
+        if local is None:
+            return None
+        domain = m.group("domain")
+        if source == "obfuscated" or not _PLAIN_DOMAIN.fullmatch(domain):
+            domain = _OBFUSCATED_DOT.sub(".", domain)
+            source = "obfuscated"
+        # Already matched piecewise by the anchored patterns; no fullmatch needed
+        if domain.rsplit(".", 1)[-1].lower() in NON_TLDS:
+            return None
+        return local.start(), m.end(), [((local.group("local") + "@" + domain).lower(), source)]
+    return m.start(), m.end(), [f for f in found if f[0]]
+
+
+def find_hits(buf: str) -> list:
+    """All trigger matches in `buf` as (start, end, [(email, source)]), in page order."""
+    hits = []
+    for source, pattern in TRIGGERS:
+        for m in pattern.finditer(buf):
+            hit = _hit(buf, source, m)
+            if hit is not None:
+                hits.append(hit)
+    hits.sort(key=lambda h: h[0])
+    return hits
+
+
+class ChunkScanner:
+    """
+    Incremental email finder: feed() text chunks in page order, then
+    finish() for the addresses ranked best first (mailto: links, then
+    Cloudflare-protected, then plain text, then de-obfuscated; ties in
+    page order).
+
+    A match ending near the end of a chunk may continue in the next one,
+    so it is only accepted once the following chunk (or finish()) shows
+    where it ends. CHUNK_OVERLAP characters are carried between chunks.
+
+    With first_match=True the scan is done at the first mailto: or
+    Cloudflare address, or FIRST_MATCH_GRACE characters after the first
+    plain-text one; finish() then returns what was found up to there.
+
+    Blocked addresses (email_score.is_blocked) are dropped and never end
+    a first_match scan.
+    """
+
+    def __init__(self, first_match: bool = False):
+        self.first_match = first_match
+        self.candidates = {}
+        self.tail = ""
+        self.tail_start = 0       # stream offset of tail[0]
+        self.accepted_until = 0   # stream offset where the last accepted match ended
+        self.first_plain_at = None
+        self.strong_found = False
+
+    @property
+    def done(self) -> bool:
+        """True once first_match mode has its address; stop feeding."""
+        if not self.first_match:
+            return False
+        if self.strong_found:
+            return True
+        return self.first_plain_at is not None and \
+            self.tail_start + len(self.tail) - self.first_plain_at >= FIRST_MATCH_GRACE
+
+    def _add(self, email: str, source: str, position: int):
+        if email_score.is_blocked(email):
+            return
+        candidate = self.candidates.get(email)
+        if candidate is None:
+            self.candidates[email] = Candidate(email, source, position)
+        else:
+            candidate.count += 1
+            if SOURCE_RANK[source] < SOURCE_RANK[candidate.source]:
+                candidate.source = source
+        if source in ("mailto", "cfemail"):
+            self.strong_found = True
+        elif self.first_plain_at is None:
+            self.first_plain_at = position
+
+    def _scan(self, buf: str, final: bool) -> int | None:
+        base = self.tail_start
+        for start, end, found in find_hits(buf):
+            if base + start < self.accepted_until:
+                continue
+            if not final and end + CHUNK_MATCH_SLACK >= len(buf):
+                return start
+            self.accepted_until = base + end
+            for email, source in found:
+                self._add(email, source, base + start)
+            if self.first_match and self.strong_found:
+                return None
+        return None
+
+    def feed(self, chunk: str):
+        if self.done:
+            return
+        buf = self.tail + chunk
+        pending = self._scan(buf, final=False)
+
+        keep_from = max(0, len(buf) - CHUNK_OVERLAP)
+        if pending is not None:
+            keep_from = min(keep_from, pending)
+        self.tail = buf[keep_from:]
+        self.tail_start += keep_from
+
+    def ranked(self) -> list:
+        """Candidates, best first."""
+        return sorted(self.candidates.values(), key=lambda c: c.rank)
+
+    def finish(self) -> list:
+        if not (self.first_match and self.strong_found):
+            self._scan(self.tail, final=True)
+        self.tail = ""
+        return [c.email for c in self.ranked()]
+
+
+def scan_chunks(chunks, first_match: bool = False) -> list:
+    """
+    Find email addresses in a stream of text chunks, best first.
+    With first_match=True scanning stops once ChunkScanner.done and the
+    remaining chunks are never pulled.
+    """
+    scanner = ChunkScanner(first_match=first_match)
+    for chunk in chunks:
+        scanner.feed(chunk)
+        if scanner.done:
+            break
+    return scanner.finish()
+
+
+def extract(text: str) -> list:
+    """Ranked Candidates for a whole page or text snippet."""
+    scanner = ChunkScanner()
+    if text:
+        scanner._scan(text, final=True)
+    return scanner.ranked()
+
+
+def extract_emails(text: str) -> list:
+    """Addresses in `text`, best first."""
+    return [c.email for c in extract(text)]
@@ -0,0 +1,156 @@
+import os
+import re
+
+import domains
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Extra addresses to never save, comma-separated: "local@" blocks a
+# mailbox name on any domain, "@domain" a whole domain, else one address
+EMAIL_BLOCKLIST = os.getenv("EMAIL_BLOCKLIST", "")
+
+# An off-site address found on pages of this many different sites in one
+# run is site chrome or a vendor (e.g. a CMS support address), not a contact
+EMAIL_SPREAD_SITES = int(os.getenv("EMAIL_SPREAD_SITES", "3"))
+
+# ---------------------------------------------------
+# Rules
+# ---------------------------------------------------
+# Tracking, form and placeholder mailboxes; "mktosubp@" is Marketo's
+# subscription address and shows up on many university news pages
+BLOCKED_LOCALS = {
+    "mktosubp", "noreply", "no-reply", "donotreply", "do-not-reply",
+    "mailer-daemon", "postmaster", "bounce", "bounces", "unsubscribe",
+    "example", "email", "name", "yourname", "username", "user", "someone",
+}
+BLOCKED_DOMAINS = {
+    "example.com", "example.org", "example.edu", "domain.com", "yourdomain.com",
+    "email.com", "sentry.io", "wixpress.com", "prestosports.com", "sidearmsports.com",
+}
+for _entry in filter(None, (e.strip().lower() for e in EMAIL_BLOCKLIST.split(","))):
+    if _entry.endswith("@"):
+        BLOCKED_LOCALS.add(_entry[:-1])
+    elif _entry.startswith("@"):
+        BLOCKED_DOMAINS.add(_entry[1:])
+    else:
+        BLOCKED_LOCALS.add(_entry)
+
+# Mailboxes of the offices that run leadership events
+ROLE_REGEX = re.compile(
+    r"event|leader|student|activit|involve|engage|orientation|program|conference|"
+    r"retreat|diversity|multicultural|inclusion|success|firstgen|civic|service|"
+    r"athlet|sail|slce|osl|campuslife|dean"
+)
+# Mailboxes that reach somebody, just not the organizer
+GENERIC_LOCALS = {
+    "webmaster", "web", "news", "newsroom", "media", "communications", "marketing",
+    "privacy", "security", "helpdesk", "support", "registrar", "library", "it",
+}
+FREEMAIL_DOMAINS = {"gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "aol.com", "icloud.com"}
+
+WEIGHTS = {
+    "same_site": 40,      # same registrable domain as the page
+    "edu": 15,            # .edu (or .edu.<cc>) address
+    "role": 10,           # events@, leadership@, studentlife@ ...
+    "generic": -10,       # webmaster@, news@ ...
+    "freemail": -5,       # gmail.com and friends
+    "position": -2,       # per place behind the extractor's best candidate
+    "position_cap": -20,
+    "spread": -25,        # off-site address seen on many sites this run
+}
+
+
+def is_blocked(email: str) -> bool:
+    local, _, domain = email.lower().partition("@")
+    return local in BLOCKED_LOCALS or domain in BLOCKED_DOMAINS or email.lower() in BLOCKED_LOCALS
+
+
+def score(email: str, page_site: str = "", position: int = 0, spread: int = 0) -> int | None:
+    """
+    One pass over the features of one address; None when it is blocked.
+    page_site is the page's registrable domain, position the address's
+    place in the extractor's ranking, spread the number of other sites
+    whose pages had it this run.
+    """
+    email = email.lower()
+    local, _, domain = email.partition("@")
+    if local in BLOCKED_LOCALS or domain in BLOCKED_DOMAINS or email in BLOCKED_LOCALS:
+        return None
+
+    site = domains.registrable_domain(domain)
+    labels = domain.rsplit(".", 2)
+    total = max(WEIGHTS["position"] * position, WEIGHTS["position_cap"])
+    if page_site and site == page_site:
+        total += WEIGHTS["same_site"]
+    elif spread >= EMAIL_SPREAD_SITES:
+        total += WEIGHTS["spread"]
+    if labels[-1] == "edu" or (len(labels) > 1 and labels[-2] == "edu"):
+        total += WEIGHTS["edu"]
+    if local in GENERIC_LOCALS:
+        total += WEIGHTS["generic"]
+    elif ROLE_REGEX.search(local):
+        total += WEIGHTS["role"]
+    if domain in FREEMAIL_DOMAINS:
+        total += WEIGHTS["freemail"]
+    return total
+
+
+def page_site(url: str) -> str:
+    return domains.site_of(url) if url else ""
+
+
+def rank_emails(url: str, emails: list, spread: dict | None = None) -> list:
+    """
+    `emails` (as ranked by email_extract) re-ranked by score, best first,
+    blocked ones dropped. spread maps address -> sites seen on this run.
+    """
+    site = page_site(url)
+    scored = []
+    for position, email in enumerate(emails):
+        value = score(email, site, position, (spread or {}).get(email, 0))
+        if value is not None:
+            scored.append((-value, position, email))
+    scored.sort()
+    return [email for _, _, email in scored]
+
+
+def best_email(url: str, emails: list) -> str | None:
+    ranked = rank_emails(url, emails)
+    return ranked[0] if ranked else None
+
+
+class BatchScorer:
+    """
+    Scores the candidate sets of a whole run together: observe() every
+    page's emails, then rank()/choose(). The run-wide view is what catches
+    an address repeated across unrelated sites (footer, vendor, tracker).
+    """
+
+    def __init__(self):
+        self.sites = {}  # address -> registrable domains of pages it was on
+
+    def observe(self, url: str, emails: list):
+        site = page_site(url)
+        for email in emails:
+            self.sites.setdefault(email.lower(), set()).add(site)
+
+    def rank(self, url: str, emails: list) -> list:
+        site = page_site(url)
+        spread = {e: len(self.sites.get(e.lower(), set()) - {site}) for e in emails}
+        return rank_emails(url, emails, spread)
+
+    def choose(self, pages: dict) -> dict:
+        """{url: emails} -> {url: best email or None}, after observing all pages."""
+        for url, emails in pages.items():
+            self.observe(url, emails or [])
+        chosen = {}
+        for url, emails in pages.items():
+            ranked = self.rank(url, emails or [])
+            chosen[url] = ranked[0] if ranked else None
+        return chosen
+
+
+def choose_batch(pages: dict) -> dict:
+    """Best email per page for a batch of {url: emails}."""
+    return BatchScorer().choose(pages)
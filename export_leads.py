@@ -1,76 +1,377 @@
+import os
 import csv
+import json
+import time
+import queue
+import argparse
+import threading
+
 import boto3
 from botocore.exceptions import ClientError
 
+import exporters
+
 # 🔴 VERY IMPORTANT:
 # Set this to EXACTLY what you see in the DynamoDB console.
 TABLE_NAME = "speaking-leads-v3-multi"
 
 OUTPUT_FILE = "leads.csv"
+OUTPUT_BASENAME = "leads"
 
 # Optional: filter by specific agent(s), or leave empty for all
 # e.g. ["first_gen_student_success_agent", "student_athlete_leadership_agent"]
 FILTER_SOURCES = []
 
+# Number of parallel scan segments (one worker thread each)
+SCAN_SEGMENTS = int(os.getenv("SCAN_SEGMENTS", "4"))
+
+# Only these attributes are read from the table and written to the CSV
+EXPORT_FIELDS = ["url", "title", "contact_email", "source", "scraped_at"]
+
+# Incremental mode: high-water mark of scraped_at / created_at (epoch secs)
+WATERMARK_FILE = os.getenv("EXPORT_WATERMARK_FILE", "export_watermark.json")
+
+# Leads are stamped when a runner builds them but written later (LeadSink
+# batches, several runs writing at once), so an older stamp can still show
+# up after a newer one. The watermark stays this far behind the export's
+# start; the overlap is read again and deduplicated by id.
+EXPORT_WATERMARK_LAG_SECONDS = int(os.getenv("EXPORT_WATERMARK_LAG_SECONDS", "900"))
+
+# Optional GSI with partition key `source` and sort key `scraped_at`
+# (numeric). When set and FILTER_SOURCES is non-empty, incremental exports
+# Query it per source instead of scanning the table. Add it on the table
+# in the main speaking-leads stack, e.g. "source-scraped_at-index".
+EXPORT_GSI_NAME = os.getenv("EXPORT_GSI_NAME", "")
+
 # 🔥 Force region to match your Terraform / Lambda (us-east-1)
 dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
 table = dynamodb.Table(TABLE_NAME)
 
+_DONE = object()
 
-def scan_table():
-    items = []
-    scan_kwargs = {}
-    done = False
-    start_key = None
 
-    while not done:
-        if start_key:
-            scan_kwargs["ExclusiveStartKey"] = start_key
+class ScanError(Exception):
+    pass
 
-        try:
-            response = table.scan(**scan_kwargs)
-        except ClientError as e:
-            print(f"Error scanning table: {e}")
-            return []  # bail out instead of continuing with 0
-        batch = response.get("Items", [])
-        items.extend(batch)
+
+def build_scan_kwargs(fields=EXPORT_FIELDS, sources=None, since=None):
+    """
+    ProjectionExpression for `fields` plus the source filter, pushed down
+    to DynamoDB. With `since`, only items stamped at or after that
+    watermark match (with their id, for deduplication).
+    """
+    if sources is None:
+        sources = FILTER_SOURCES
+
+    if since is not None:
+        fields = list(fields) + [f for f in ("id", "scraped_at", "created_at") if f not in fields]
+
+    names = {f"#f{i}": field for i, field in enumerate(fields)}
+    values = {}
+    filters = []
+    kwargs = {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+    if sources:
+        names["#src"] = "source"
+        source_values = {f":s{i}": s for i, s in enumerate(sources)}
+        values.update(source_values)
+        filters.append(f"#src IN ({', '.join(source_values)})")
+
+    if since is not None:
+        names["#sa"] = "scraped_at"
+        names["#ca"] = "created_at"
+        values[":wm"] = since
+        filters.append("(#sa >= :wm OR #ca >= :wm)")
+
+    if filters:
+        kwargs["FilterExpression"] = " AND ".join(filters)
+        kwargs["ExpressionAttributeValues"] = values
+
+    return kwargs
+
+
+def query_new_items(sources, since, fields=EXPORT_FIELDS):
+    """Yield items stamped at or after `since` from the source/scraped_at GSI."""
+    fields = list(fields) + [f for f in ("id", "scraped_at") if f not in fields]
+    names = {f"#f{i}": field for i, field in enumerate(fields)}
+    names["#src"] = "source"
+    names["#sa"] = "scraped_at"
+
+    for source in sources:
+        kwargs = {
+            "IndexName": EXPORT_GSI_NAME,
+            "KeyConditionExpression": "#src = :s AND #sa >= :wm",
+            "ProjectionExpression": ", ".join(n for n in names if n.startswith("#f")),
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": {":s": source, ":wm": since},
+        }
+        while True:
+            try:
+                response = table.query(**kwargs)
+            except ClientError as e:
+                raise ScanError(f"Error querying {EXPORT_GSI_NAME}: {e}")
+            yield from response.get("Items", [])
+
+            start_key = response.get("LastEvaluatedKey", None)
+            if start_key is None:
+                break
+            kwargs["ExclusiveStartKey"] = start_key
+
+
+def scan_segment(segment, total_segments, scan_kwargs):
+    """Yield pages of items from one scan segment."""
+    kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = table.scan(**kwargs)
+        yield response.get("Items", [])
 
         start_key = response.get("LastEvaluatedKey", None)
-        done = start_key is None
+        if start_key is None:
+            return
+        kwargs["ExclusiveStartKey"] = start_key
+
+
+def scan_table(scan_kwargs=None, segments=SCAN_SEGMENTS):
+    """
+    Parallel segmented scan. Yields items as pages arrive, so the whole
+    table is never held in memory. Raises ScanError if any segment fails.
+    """
+    if scan_kwargs is None:
+        scan_kwargs = build_scan_kwargs()
+
+    # Bounded so fast segments wait for the writer instead of piling up pages
+    pages = queue.Queue(maxsize=segments * 2)
+    errors = []
+
+    def worker(segment):
+        try:
+            for page in scan_segment(segment, segments, scan_kwargs):
+                pages.put(page)
+        except Exception as e:
+            # Any failure (ClientError, connection errors, retries running
+            # out) means a missing segment: the export must not complete
+            errors.append(e)
+        finally:
+            pages.put(_DONE)
 
-    return items
+    threads = [
+        threading.Thread(target=worker, args=(s,), daemon=True)
+        for s in range(segments)
+    ]
+    for t in threads:
+        t.start()
 
+    remaining = segments
+    while remaining:
+        page = pages.get()
+        if page is _DONE:
+            remaining -= 1
+            continue
+        yield from page
 
-def filter_items(items):
-    if not FILTER_SOURCES:
-        return items
+    if errors:
+        raise ScanError(f"Error scanning table ({len(errors)} of {segments} segments failed): {errors[0]!r}")
 
-    filtered = [i for i in items if i.get("source") in FILTER_SOURCES]
-    return filtered
 
+def write_csv(items, filename, fieldnames=EXPORT_FIELDS, append=False):
+    """
+    Stream items into the CSV; returns the number of rows written.
+    With append=True the rows are added to the end of an existing file.
+    """
+    count = 0
+    # Write to a temp file so a failed scan doesn't clobber the last export
+    tmp_name = filename + ".tmp"
 
-def write_csv(items, filename):
-    fieldnames = ["url", "title", "contact_email", "source", "scraped_at"]
+    try:
+        with open(tmp_name, mode="w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
 
-    with open(filename, mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+            for item in items:
+                row = {field: item.get(field, "") for field in fieldnames}
+                writer.writerow(row)
+                count += 1
+    except BaseException:
+        os.remove(tmp_name)
+        raise
 
-        for item in items:
-            row = {field: item.get(field, "") for field in fieldnames}
-            writer.writerow(row)
+    if append and os.path.exists(filename) and os.path.getsize(filename) > 0:
+        with open(tmp_name, encoding="utf-8") as src, \
+                open(filename, mode="a", newline="", encoding="utf-8") as dst:
+            next(src)  # header is already in the target file
+            for line in src:
+                dst.write(line)
+        os.remove(tmp_name)
+    else:
+        os.replace(tmp_name, filename)
+    return count
+
+
+def write_export(items, filename, fmt):
+    """Write items with one of exporters.EXPORTERS; returns the row count."""
+    _, writer = exporters.EXPORTERS[fmt]
+    tmp_name = filename + ".tmp"
+    try:
+        count = writer(items, tmp_name)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    os.replace(tmp_name, filename)
+    return count
+
+
+def export_fields(fmt):
+    """CSV keeps its five columns; columnar formats export every field."""
+    return EXPORT_FIELDS if fmt == "csv" else exporters.ALL_FIELDS
+
+
+def output_filename(fmt, suffix=""):
+    if fmt == "csv":
+        ext = ".csv"
+    else:
+        ext, _ = exporters.EXPORTERS[fmt]
+    return f"{OUTPUT_BASENAME}{suffix}{ext}"
+
+
+# ---------------------------------------------------
+# Incremental export watermark
+# ---------------------------------------------------
+def load_watermark():
+    """(watermark, ids of the items at or after it that were already exported)."""
+    try:
+        with open(WATERMARK_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return 0, set()
+    return int(data.get("scraped_at", 0)), set(data.get("ids", []))
+
+
+def save_watermark(value, ids=()):
+    with open(WATERMARK_FILE, mode="w", encoding="utf-8") as f:
+        json.dump({"scraped_at": int(value), "ids": sorted(ids), "updated_at": int(time.time())}, f)
+
+
+def item_timestamp(item):
+    """scraped_at (agent runners) or created_at (truck ESL agent), as an int."""
+    value = item.get("scraped_at") or item.get("created_at") or 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def watermark_state(since, seen, started):
+    return {
+        "since": since,
+        "seen": seen,
+        "cutoff": started - EXPORT_WATERMARK_LAG_SECONDS,
+        "max": since,
+        "at_max": set(),
+        "recent": {},
+    }
+
+
+def track_watermark(items, state):
+    """
+    Pass items through, dropping the ones state["seen"] says an earlier
+    export already wrote, while recording what next_watermark needs: the
+    newest timestamp, the ids stamped with it and those at or after the
+    lag cutoff.
+    """
+    for item in items:
+        stamp = item_timestamp(item)
+        item_id = item.get("id")
+        if stamp > state["max"]:
+            state["max"], state["at_max"] = stamp, set()
+        if stamp == state["max"]:
+            state["at_max"].add(item_id)
+        if stamp >= state["cutoff"]:
+            state["recent"][item_id] = stamp
+        if item_id in state["seen"]:
+            continue
+        yield item
+
+
+def next_watermark(state):
+    """
+    (watermark, ids) to save: the newest timestamp read, but no later than
+    EXPORT_WATERMARK_LAG_SECONDS before the export started, and the ids at
+    or after it, which the next export reads again and skips.
+    """
+    watermark = max(state["since"], min(state["max"], state["cutoff"]))
+    ids = {item_id for item_id, stamp in state["recent"].items() if stamp >= watermark}
+    if watermark == state["max"]:
+        ids |= state["at_max"]
+    return watermark, ids
+
+
+def incremental_export(mode, fmt="csv"):
+    started = int(time.time())
+    since, seen = load_watermark()
+    fields = export_fields(fmt)
+    print(f"Incremental export of leads from {since} on ...")
+
+    if EXPORT_GSI_NAME and FILTER_SOURCES:
+        print(f"Querying GSI {EXPORT_GSI_NAME} for {FILTER_SOURCES}")
+        items = query_new_items(FILTER_SOURCES, since, fields=fields)
+    else:
+        items = scan_table(build_scan_kwargs(fields=fields, since=since))
+
+    state = watermark_state(since, seen, started)
+    items = track_watermark(items, state)
+    if fmt != "csv":
+        # Compressed / columnar files can't be appended to, always write a delta
+        filename = output_filename(fmt, f"-delta-{int(time.time())}")
+        count = write_export(items, filename, fmt)
+    elif mode == "delta":
+        filename = output_filename(fmt, f"-delta-{int(time.time())}")
+        count = write_csv(items, filename)
+    else:
+        filename = OUTPUT_FILE
+        count = write_csv(items, filename, append=True)
+
+    watermark, ids = next_watermark(state)
+    save_watermark(watermark, ids)
+    print(f"Exported {count} new items to {filename} (watermark now {watermark})")
 
 
 def main():
-    print(f"Scanning DynamoDB table: {TABLE_NAME} ...")
-    items = scan_table()
-    print(f"Total items scanned: {len(items)}")
+    parser = argparse.ArgumentParser(description="Export leads from DynamoDB")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only export leads newer than the saved watermark")
+    parser.add_argument("--mode", choices=["append", "delta"], default="append",
+                        help="incremental output: append to leads.csv or write a delta file")
+    parser.add_argument("--format", choices=["csv"] + list(exporters.EXPORTERS), default="csv",
+                        help="output format (jsonl.zst needs zstandard, parquet needs pyarrow)")
+    args = parser.parse_args()
+
+    if args.incremental:
+        try:
+            incremental_export(args.mode, args.format)
+        except (ScanError, exporters.ExporterUnavailable) as e:
+            raise SystemExit(f"Export failed: {e}")
+        return
+
+    print(f"Scanning DynamoDB table: {TABLE_NAME} ({SCAN_SEGMENTS} segments) ...")
+    if FILTER_SOURCES:
+        print(f"Filtering on source: {FILTER_SOURCES}")
 
-    items = filter_items(items)
-    print(f"Total items after filter: {len(items)}")
+    items = scan_table(build_scan_kwargs(fields=export_fields(args.format)))
+    try:
+        if args.format == "csv":
+            filename = OUTPUT_FILE
+            count = write_csv(items, filename)
+        else:
+            filename = output_filename(args.format)
+            count = write_export(items, filename, args.format)
+    except (ScanError, exporters.ExporterUnavailable) as e:
+        raise SystemExit(f"Export failed: {e}")
 
-    write_csv(items, OUTPUT_FILE)
-    print(f"Exported to {OUTPUT_FILE}")
+    print(f"Exported {count} items to {filename}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+import os
+import gzip
+import json
+from decimal import Decimal
+
+# Optional dependencies: only needed for the formats that use them
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Every attribute any of the runners writes (lambda.py, lambda_backup_DEC06.py,
+# sga_lambda_function.py). The CSV keeps its short EXPORT_FIELDS list.
+ALL_FIELDS = [
+    "id",
+    "url",
+    "title",
+    "contact_email",
+    "email",
+    "emails",
+    "domain",
+    "snippet",
+    "source",
+    "agent",
+    "topic",
+    "query",
+    "scraped_at",
+    "created_at",
+    "timestamp",
+]
+
+INT_FIELDS = {"scraped_at", "created_at"}
+LIST_FIELDS = {"emails"}
+
+# Rows buffered per write (one Parquet row group per chunk)
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "50000"))
+
+
+class ExporterUnavailable(Exception):
+    """The optional package a format needs is not installed."""
+
+
+def to_plain(value):
+    """Convert DynamoDB Decimals/sets into JSON-friendly Python values."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, list, tuple)):
+        return [to_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    return value
+
+
+def chunked(items, size=EXPORT_ROW_GROUP_SIZE):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---------------------------------------------------
+# JSONL (gzip / zstd)
+# ---------------------------------------------------
+def _write_jsonl(items, f, fields):
+    count = 0
+    for chunk in chunked(items):
+        lines = []
+        for item in chunk:
+            row = {k: to_plain(item[k]) for k in fields if k in item}
+            lines.append(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+        f.write(("\n".join(lines) + "\n").encode("utf-8"))
+        count += len(chunk)
+    return count
+
+
+def write_jsonl_gzip(items, filename, fields=ALL_FIELDS):
+    with gzip.open(filename, mode="wb", compresslevel=6) as f:
+        return _write_jsonl(items, f, fields)
+
+
+def write_jsonl_zstd(items, filename, fields=ALL_FIELDS):
+    if zstandard is None:
+        raise ExporterUnavailable("jsonl.zst export needs the 'zstandard' package")
+    cctx = zstandard.ZstdCompressor(level=10)
+    with open(filename, mode="wb") as raw, cctx.stream_writer(raw) as f:
+        return _write_jsonl(items, f, fields)
+
+
+# ---------------------------------------------------
+# Parquet
+# ---------------------------------------------------
+def _parquet_schema(fields):
+    columns = []
+    for field in fields:
+        if field in INT_FIELDS:
+            columns.append((field, pa.int64()))
+        elif field in LIST_FIELDS:
+            columns.append((field, pa.list_(pa.string())))
+        else:
+            columns.append((field, pa.string()))
+    return pa.schema(columns)
+
+
+def _parquet_value(field, value):
+    if value is None:
+        return None
+    value = to_plain(value)
+    if field in INT_FIELDS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    if field in LIST_FIELDS:
+        return [str(v) for v in value] if isinstance(value, list) else [str(value)]
+    return str(value)
+
+
+def write_parquet(items, filename, fields=ALL_FIELDS):
+    if pa is None:
+        raise ExporterUnavailable("parquet export needs the 'pyarrow' package")
+    schema = _parquet_schema(fields)
+    count = 0
+    with pq.ParquetWriter(filename, schema, compression="zstd") as writer:
+        for chunk in chunked(items):
+            columns = {
+                field: [_parquet_value(field, item.get(field)) for item in chunk]
+                for field in fields
+            }
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            count += len(chunk)
+    return count
+
+
+# format name -> (file extension, writer function)
+EXPORTERS = {
+    "jsonl.gz": (".jsonl.gz", write_jsonl_gzip),
+    "jsonl.zst": (".jsonl.zst", write_jsonl_zstd),
+    "parquet": (".parquet", write_parquet),
+}
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import botocore.exceptions
+
+import state_store
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Search queries per shard; each shard is one worker invocation
+FANOUT_QUERIES_PER_SHARD = int(os.getenv("FANOUT_QUERIES_PER_SHARD", "2"))
+
+# "lambda" invokes the worker function asynchronously per shard;
+# "local" runs shards in this process on a thread pool
+FANOUT_INVOKER = os.getenv("FANOUT_INVOKER", "lambda")
+FANOUT_LOCAL_WORKERS = int(os.getenv("FANOUT_LOCAL_WORKERS", "4"))
+
+# Function that runs shards; defaults to the coordinator's own function
+# (dispatch_handler and coordinator_handler both route "mode": "worker")
+FANOUT_WORKER_FUNCTION = os.getenv("FANOUT_WORKER_FUNCTION", "")
+
+# How long the coordinator waits for shard results before summarizing
+FANOUT_WAIT_SECONDS = int(os.getenv("FANOUT_WAIT_SECONDS", "600"))
+FANOUT_POLL_SECONDS = float(os.getenv("FANOUT_POLL_SECONDS", "5"))
+FANOUT_RESULT_TTL_SECONDS = int(os.getenv("FANOUT_RESULT_TTL_SECONDS", str(2 * 24 * 3600)))
+
+
+def make_shards(workload: dict, per_shard: int = FANOUT_QUERIES_PER_SHARD) -> list:
+    """
+    Split {agent_name: number_of_queries} into shards of at most
+    `per_shard` queries, each {"id", "agent", "query_indexes"}.
+    """
+    per_shard = max(1, per_shard)
+    shards = []
+    for agent_name, num_queries in workload.items():
+        for first in range(0, num_queries, per_shard):
+            shards.append({
+                "id": f"{agent_name}:{first}",
+                "agent": agent_name,
+                "query_indexes": list(range(first, min(num_queries, first + per_shard))),
+            })
+    return shards
+
+
+# ---------------------------------------------------
+# Invokers: invoke(payload) starts one worker, close() waits for local ones
+# ---------------------------------------------------
+class LambdaInvoker:
+    """Asynchronous (InvocationType=Event) invocation of the worker function."""
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.client = boto3.client("lambda")
+
+    def invoke(self, payload: dict):
+        self.client.invoke(
+            FunctionName=self.function_name,
+            InvocationType="Event",
+            Payload=json.dumps(payload).encode("utf-8"),
+        )
+
+    def close(self):
+        pass
+
+
+class LocalInvoker:
+    """
+    Runs `handler(payload, None)` in this process on a thread pool, the
+    same way Lambda would run the worker. For local runs and tests; pass
+    a stub handler to exercise the coordinator without running agents.
+    """
+
+    def __init__(self, handler, max_workers: int = FANOUT_LOCAL_WORKERS):
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fanout")
+
+    def invoke(self, payload: dict):
+        self.executor.submit(self.handler, payload, None)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def get_invoker(context, worker_handler):
+    """
+    Invoker picked by FANOUT_INVOKER (the local one runs worker_handler).
+    Raises RuntimeError for Lambda workers without a shared state store,
+    since their results would never reach the coordinator.
+    """
+    if FANOUT_INVOKER == "local" or context is None:
+        return LocalInvoker(worker_handler)
+    if not state_store.is_shared():
+        raise RuntimeError(
+            "Fan-out to Lambda workers needs the shared state table (STATE_TABLE_NAME); "
+            "use FANOUT_INVOKER=local to run shards in this process"
+        )
+    return LambdaInvoker(FANOUT_WORKER_FUNCTION or context.invoked_function_arn)
+
+
+# ---------------------------------------------------
+# Shard results (state table, shared by all invocations)
+# ---------------------------------------------------
+def _manifest_key(run_id: str) -> str:
+    return f"fanout#{run_id}"
+
+
+def _result_key(run_id: str, shard_id: str) -> str:
+    return f"fanout#{run_id}#{shard_id}"
+
+
+def put_result(run_id: str, shard_id: str, result: dict):
+    state_store.get_store().put(_result_key(run_id, shard_id), result, ttl=FANOUT_RESULT_TTL_SECONDS)
+
+
+def load_shards(run_id: str) -> list | None:
+    manifest = state_store.get_store().get(_manifest_key(run_id))
+    return manifest.get("shards") if manifest else None
+
+
+def start(invoker, shards: list, payload: dict | None = None) -> str:
+    """
+    Record the shard list under a new run id and invoke one worker per
+    shard with {**payload, "mode": "worker", "run_id", "shard"}.
+    Returns the run id.
+    """
+    run_id = uuid.uuid4().hex
+    state_store.get_store().put(_manifest_key(run_id), {"shards": shards}, ttl=FANOUT_RESULT_TTL_SECONDS)
+
+    for shard in shards:
+        body = dict(payload or {}, mode="worker", run_id=run_id, shard=shard)
+        try:
+            invoker.invoke(body)
+        except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
+            logger.error(f"[fanout] Could not invoke shard {shard['id']}: {e}")
+            put_result(run_id, shard["id"], {"source": shard["agent"], "saved": 0, "error": str(e)})
+
+    logger.info(f"[fanout] Run {run_id}: invoked {len(shards)} shards")
+    return run_id
+
+
+def summarize(run_id: str, shards: list, results: dict) -> dict:
+    failed = [sid for sid, r in results.items() if r.get("error")]
+    incomplete = [sid for sid, r in results.items() if r.get("resume_from")]
+    total_saved = sum(r.get("saved", 0) for r in results.values())
+    return {
+        "message": f"Fan-out run {run_id}: {len(results)} of {len(shards)} shards done. Saved {total_saved} items.",
+        "run_id": run_id,
+        "saved": total_saved,
+        "shards": len(shards),
+        "done": len(results),
+        "pending": [s["id"] for s in shards if s["id"] not in results],
+        "failed": failed,
+        "incomplete": incomplete,
+        "results": results,
+    }
+
+
+def collect(run_id: str, shards: list, wait_seconds: float = 0) -> dict:
+    """
+    Poll the state table for shard results for up to `wait_seconds`,
+    then summarize whatever has arrived. With wait_seconds=0 this is a
+    single look (e.g. a later status call).
+    """
+    store = state_store.get_store()
+    results = {}
+    give_up = time.monotonic() + max(0.0, wait_seconds)
+    while True:
+        for shard in shards:
+            if shard["id"] not in results:
+                result = store.get(_result_key(run_id, shard["id"]))
+                if result is not None:
+                    results[shard["id"]] = result
+        if len(results) == len(shards) or time.monotonic() >= give_up:
+            return summarize(run_id, shards, results)
+        time.sleep(min(FANOUT_POLL_SECONDS, max(0.0, give_up - time.monotonic())))
@@ -0,0 +1,198 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import domains
+import profiling
+import urls
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Total number of pages fetched at the same time
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "16"))
+
+# How many requests may hit a single host at the same time
+FETCH_PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "2"))
+
+# Wall-clock budget for one fetch stage (Lambda timeout is 900s)
+FETCH_DEADLINE_SECONDS = float(os.getenv("FETCH_DEADLINE_SECONDS", "600"))
+
+# Module-scoped so warm invocations reuse the same threads
+_executor = None
+_executor_lock = threading.Lock()
+
+_host_semaphores = {}
+_host_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared fetch thread pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=FETCH_MAX_WORKERS,
+                thread_name_prefix="fetch",
+            )
+        return _executor
+
+
+def host_semaphore(url: str) -> threading.BoundedSemaphore:
+    """Return the semaphore limiting concurrent requests to this URL's host."""
+    host = domains.host_key(url)
+    with _host_lock:
+        sem = _host_semaphores.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(FETCH_PER_HOST_LIMIT)
+            _host_semaphores[host] = sem
+        return sem
+
+
+def make_deadline(seconds: float | None = None) -> float:
+    """Absolute monotonic deadline `seconds` from now."""
+    if seconds is None:
+        seconds = FETCH_DEADLINE_SECONDS
+    return time.monotonic() + seconds
+
+
+def _run_one(url: str, worker, deadline: float):
+    # Skip work that would only start after the deadline has passed
+    if time.monotonic() >= deadline:
+        raise TimeoutError(f"deadline passed before fetching {url}")
+
+    with host_semaphore(url):
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"deadline passed before fetching {url}")
+        return profiling.call(worker, url)
+
+
+# ---------------------------------------------------
+# Per-run content cache
+# ---------------------------------------------------
+def normalize_url(url: str) -> str:
+    """Cache key for a URL (see urls.url_key)."""
+    return urls.url_key(url)
+
+
+class RunCache:
+    """
+    Results of worker(url) for one run, keyed by normalized URL and shared
+    by every agent in that run. Each distinct page is fetched once; a
+    second agent asking for the same URL (even while the first fetch is
+    still in flight) gets the same result. Failures are not cached.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, url: str, worker):
+        key = normalize_url(url)
+        with self.lock:
+            future = self.entries.get(key)
+            if future is not None:
+                self.hits += 1
+                owner = False
+            else:
+                future = Future()
+                self.entries[key] = future
+                self.misses += 1
+                owner = True
+
+        if not owner:
+            value, _ = future.result()
+            return value
+
+        try:
+            value = worker(url)
+        except BaseException as e:
+            with self.lock:
+                self.entries.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result((value, time.time()))
+        return value
+
+    def peek(self, url: str) -> tuple:
+        """(True, value) if url already finished earlier in this run, else (False, None)."""
+        future = self.entries.get(normalize_url(url))
+        if future is None or not future.done() or future.exception():
+            return False, None
+        with self.lock:
+            self.hits += 1
+        return True, future.result()[0]
+
+    def store(self, url: str, value):
+        """Record a result computed outside get_or_compute (e.g. by a coroutine)."""
+        future = Future()
+        future.set_result((value, time.time()))
+        with self.lock:
+            self.entries.setdefault(normalize_url(url), future)
+            self.misses += 1
+
+    def fetched_at(self, url: str) -> float | None:
+        future = self.entries.get(normalize_url(url))
+        if future is None or not future.done() or future.exception():
+            return None
+        return future.result()[1]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"urls": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+def fetch_all(urls, worker, deadline: float | None = None, cache: RunCache | None = None) -> dict:
+    """
+    Run worker(url) for every URL on the shared pool.
+
+    Returns {url: result} for the URLs that finished before the deadline.
+    URLs that failed or ran out of time are left out of the result.
+    With a RunCache, URLs already fetched earlier in the run are reused.
+    """
+    if deadline is None:
+        deadline = make_deadline()
+
+    if cache is not None:
+        uncached_worker = worker
+
+        def worker(url):
+            return cache.get_or_compute(url, uncached_worker)
+
+    unique_urls = list(dict.fromkeys(u for u in urls if u))
+    if not unique_urls:
+        return {}
+
+    # Each task runs in a copy of the caller's context so per-run state
+    # (e.g. the metrics agent) follows it into the pool threads
+    executor = get_executor()
+    futures = {
+        executor.submit(contextvars.copy_context().run, _run_one, url, worker, deadline): url
+        for url in unique_urls
+    }
+
+    done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    for f in not_done:
+        f.cancel()
+    if not_done:
+        logger.warning(
+            f"Fetch deadline reached: {len(not_done)} of {len(futures)} URLs unfinished"
+        )
+
+    results = {}
+    for f in done:
+        url = futures[f]
+        try:
+            results[url] = f.result()
+        except Exception as e:
+            logger.warning(f"Fetch worker failed for {url}: {e}")
+    return results
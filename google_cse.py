@@ -0,0 +1,209 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+
+import http_client
+import metrics
+import state_store
+import urls
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GOOGLE_CX = os.getenv("GOOGLE_CX")
+
+# Overridable so benchmarks can point at a local stand-in
+CSE_ENDPOINT = os.getenv("CSE_ENDPOINT", "https://www.googleapis.com/customsearch/v1")
+
+# How long a cached response for (query, start, num) stays valid
+CSE_CACHE_TTL_SECONDS = int(os.getenv("CSE_CACHE_TTL_SECONDS", str(3 * 24 * 3600)))
+
+# Google's free tier is 100 queries/day; 0 disables a limit
+CSE_DAILY_QUOTA = int(os.getenv("CSE_DAILY_QUOTA", "100"))
+CSE_RUN_QUOTA = int(os.getenv("CSE_RUN_QUOTA", "0"))
+
+# Result pages fetched per query by iter_results (10 results per page)
+CSE_MAX_PAGES = int(os.getenv("CSE_MAX_PAGES", "3"))
+
+# Google never returns results past the 100th (start + num - 1 <= 100)
+CSE_MAX_RESULTS = 100
+
+# Most results one call can return; every call costs the same quota
+CSE_PAGE_SIZE = 10
+
+
+class QuotaExceeded(Exception):
+    """Raised instead of calling Google once the run or daily quota is spent."""
+
+
+# Per-run counters (reset by start_run)
+_run_stats = {"api_calls": 0, "cache_hits": 0, "early_stops": 0}
+_run_lock = threading.Lock()
+
+
+def start_run():
+    """Reset the per-run counters; call once at the start of each run."""
+    with _run_lock:
+        _run_stats["api_calls"] = 0
+        _run_stats["cache_hits"] = 0
+        _run_stats["early_stops"] = 0
+
+
+def run_stats() -> dict:
+    with _run_lock:
+        stats = dict(_run_stats)
+    stats["day_calls"] = state_store.get_store().get_count(_day_key())
+    return stats
+
+
+def _day_key() -> str:
+    # Google resets the CSE quota at midnight Pacific; UTC day is close enough
+    return "cse-quota#" + datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _cache_key(query: str, start: int, num: int) -> str:
+    raw = json.dumps([query, start, num])
+    return "cse#" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def reserve_call():
+    """Count one API call against the quotas, or raise QuotaExceeded."""
+    with _run_lock:
+        if CSE_RUN_QUOTA and _run_stats["api_calls"] >= CSE_RUN_QUOTA:
+            metrics.count("search", "quota_exceeded")
+            raise QuotaExceeded(f"CSE run quota of {CSE_RUN_QUOTA} reached")
+        _run_stats["api_calls"] += 1
+
+    if CSE_DAILY_QUOTA:
+        used = state_store.get_store().incr(_day_key(), 1, ttl=2 * 24 * 3600)
+        if used > CSE_DAILY_QUOTA:
+            with _run_lock:
+                _run_stats["api_calls"] -= 1
+            metrics.count("search", "quota_exceeded")
+            raise QuotaExceeded(f"CSE daily quota of {CSE_DAILY_QUOTA} reached")
+
+
+def cached_items(query: str, start: int = 1, num: int = 10) -> list | None:
+    """Cached items for (query, start, num), or None on a miss."""
+    cached = state_store.get_store().get(_cache_key(query, start, num))
+    if cached is None:
+        return None
+    with _run_lock:
+        _run_stats["cache_hits"] += 1
+    metrics.count("search", "cache_hits")
+    logger.info(f"[google_cse] Cache hit: {query} (start={start}, num={num})")
+    # Entries cached before links were canonicalized
+    return urls.canonical_items(cached.get("items", []))
+
+
+def store_items(query: str, start: int, num: int, items: list):
+    state_store.get_store().put(
+        _cache_key(query, start, num), {"items": items}, ttl=CSE_CACHE_TTL_SECONDS
+    )
+
+
+def request_params(query: str, start: int = 1, num: int = 10) -> dict:
+    return {
+        "key": GOOGLE_API_KEY,
+        "cx": GOOGLE_CX,
+        "q": query,
+        "start": start,
+        "num": num,
+    }
+
+
+def search(query: str, start: int = 1, num: int = 10) -> list:
+    """
+    Google Custom Search with a response cache in front of it.
+    Returns the items list, each "link" canonicalized (see urls.py).
+    Raises QuotaExceeded or HTTP errors.
+    """
+    items = cached_items(query, start, num)
+    if items is not None:
+        return items
+
+    reserve_call()
+
+    with metrics.timed("search"):
+        resp = http_client.get(CSE_ENDPOINT, params=request_params(query, start, num), timeout=15)
+        resp.raise_for_status()
+    metrics.add_bytes("search", len(resp.content))
+    items = urls.canonical_items(resp.json().get("items", []))
+
+    store_items(query, start, num, items)
+    return items
+
+
+# ---------------------------------------------------
+# Pagination
+# ---------------------------------------------------
+def pages_for(wanted: int) -> int:
+    """Full pages (one quota-counted call each) needed for `wanted` results."""
+    return max(1, -(-wanted // CSE_PAGE_SIZE))
+
+
+def page_starts(pages: int | None = None, num: int = 10):
+    """`start` values for up to `pages` pages of `num` results."""
+    pages = CSE_MAX_PAGES if pages is None else pages
+    for page in range(max(1, pages)):
+        start = 1 + page * num
+        if start + num - 1 > CSE_MAX_RESULTS:
+            return
+        yield start
+
+
+def is_last_page(query: str, start: int, num: int, items: list, known_links=None) -> bool:
+    """
+    True when no further page should be requested after this one: the
+    page was short (Google has nothing more) or every link on it is
+    already known. known_links(links) returns the subset already stored.
+    """
+    if len(items) < num:
+        return True
+    if known_links is None:
+        return False
+
+    links = [item["link"] for item in items if item.get("link")]
+    known = known_links(links) if links else set()
+    if len(known) < len(set(links)):
+        return False
+
+    with _run_lock:
+        _run_stats["early_stops"] += 1
+    metrics.count("search", "early_stops")
+    logger.info(f"[google_cse] Only known URLs at start={start} for '{query}'; not fetching more pages")
+    return True
+
+
+def iter_results(query: str, pages: int | None = None, num: int = 10, known_links=None):
+    """
+    Yield search result items for `query` across up to `pages` pages
+    (CSE_MAX_PAGES by default). Pages are requested lazily, one at a time,
+    and iteration stops early per is_last_page().
+
+    Errors on the first page are raised as from search(); on later pages
+    they end the iteration and the results so far stand.
+    """
+    for start in page_starts(pages, num):
+        try:
+            items = search(query, start=start, num=num)
+        except Exception as e:
+            if start == 1:
+                raise
+            logger.warning(f"[google_cse] Stopping pagination for '{query}' at start={start}: {e}")
+            return
+
+        # Decide before yielding: the caller may store these links meanwhile
+        last = is_last_page(query, start, num, items, known_links)
+        yield from items
+        if last:
+            return
@@ -0,0 +1,208 @@
+import os
+import codecs
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import metrics
+import rate_limit
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Number of per-host connection pools kept alive
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "64"))
+
+# Max open connections per host (should be >= FETCH_MAX_WORKERS)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+
+# Retries for connection errors and 5xx responses; 429/503 are retried
+# by get() after the host's Retry-After pause (see rate_limit.py)
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+
+DEFAULT_TIMEOUT = 15
+
+# Page bodies are read in chunks and cut off after this many bytes
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+FETCH_CHUNK_SIZE = int(os.getenv("FETCH_CHUNK_SIZE", str(64 * 1024)))
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; SpeakingAgent/1.0; +https://example.com)"
+}
+
+# ---------------------------------------------------
+# Connection-reuse counters
+# ---------------------------------------------------
+_stats = {
+    "requests": 0,
+    "connections_opened": 0,
+    "bytes_read": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str, amount: int = 1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("connections_opened")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("connections_opened")
+        return super()._new_conn()
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count every new TCP/TLS connection."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+# ---------------------------------------------------
+# Shared session
+# ---------------------------------------------------
+# Module-scoped so warm Lambda invocations keep their connections
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    # 429/503 are left to get(): urllib3 would sleep out the whole
+    # Retry-After here, uncapped and outside the host's token bucket
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=(500, 502, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = _CountingAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the shared pooled session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    GET through the shared session (drop-in for requests.get).
+    Waits for the host's token bucket first (see rate_limit.py). A 429/503
+    pauses the host and is retried up to HTTP_RETRIES times, unless the
+    host asked for more than MAX_RETRY_AFTER_SECONDS; the last response
+    is returned either way.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    attempt = 0
+    while True:
+        rate_limit.wait_turn(url)
+        _count("requests")
+        resp = get_session().get(url, **kwargs)
+        retry_after = rate_limit.note_response(url, resp.status_code, resp.headers)
+        if (
+            retry_after is None
+            or attempt >= HTTP_RETRIES
+            or retry_after > rate_limit.MAX_RETRY_AFTER_SECONDS
+        ):
+            return resp
+        resp.close()
+        attempt += 1
+
+
+def text_decoder(encoding: str | None):
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+def open_html(url: str, **kwargs) -> requests.Response | None:
+    """
+    Start a streamed GET for an HTML page. Returns the open response (the
+    caller must close it), or None for non-HTML content, whose body is
+    never downloaded. HTTP errors are raised; 304 is returned as-is.
+    """
+    resp = get(url, stream=True, **kwargs)
+    try:
+        resp.raise_for_status()
+    except Exception:
+        resp.close()
+        raise
+
+    content_type = resp.headers.get("Content-Type", "")
+    if resp.status_code != 304 and content_type and "html" not in content_type.lower():
+        logger.info(f"Skipping non-HTML content ({content_type}) at {url}")
+        resp.close()
+        return None
+    return resp
+
+
+def iter_text(resp: requests.Response, max_bytes: int = FETCH_MAX_BYTES, chunk_size: int = FETCH_CHUNK_SIZE):
+    """Decoded text chunks of an open response, stopping after max_bytes."""
+    decoder = text_decoder(resp.encoding)
+    remaining = max_bytes
+    for chunk in resp.iter_content(chunk_size):
+        if len(chunk) >= remaining:
+            chunk = chunk[:remaining]
+            remaining = 0
+        else:
+            remaining -= len(chunk)
+        _count("bytes_read", len(chunk))
+        metrics.add_bytes("fetch", len(chunk))
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+        if remaining == 0:
+            logger.info(f"Truncated {resp.url} at {max_bytes} bytes")
+            break
+
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def connection_stats() -> dict:
+    """Requests sent, connections opened and body bytes read since the container started."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["connections_reused"] = max(0, stats["requests"] - stats["connections_opened"])
+    return stats
+
+
+def log_connection_stats(prefix: str = "http"):
+    logger.info(f"[{prefix}] HTTP connection stats: {connection_stats()}")
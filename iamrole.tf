@@ -6,3 +6,79 @@ data "aws_iam_role" "lambda_exec" {
   # This is the role that already exists from your multi-agent project
   name = "speaking-agent-lambda-role-v3-multi"
 }
+
+# Let the existing role use the agent state table
+resource "aws_iam_role_policy" "agent_state_access" {
+  name = "speaking-agent-state-access"
+  role = data.aws_iam_role.lambda_exec.name
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:DeleteItem",
+        ]
+        Resource = aws_dynamodb_table.agent_state.arn
+      }
+    ]
+  })
+}
+
+# Checkpointed runs re-invoke their own function to continue
+# (checkpoint.py) and the fan-out coordinator invokes its worker
+# function (fanout.py). Only the agent functions may be invoked, with
+# or without a version/alias qualifier.
+data "aws_caller_identity" "current" {}
+
+locals {
+  agent_function_arns = concat(
+    [aws_lambda_function.truck_esl_agent.arn],
+    [
+      for name in var.agent_function_names :
+      "arn:aws:lambda:${var.aws_region}:${data.aws_caller_identity.current.account_id}:function:${name}"
+    ],
+  )
+}
+
+resource "aws_iam_role_policy" "agent_self_invoke" {
+  name = "speaking-agent-self-invoke"
+  role = data.aws_iam_role.lambda_exec.name
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect   = "Allow"
+        Action   = ["lambda:InvokeFunction"]
+        Resource = flatten([for arn in local.agent_function_arns : [arn, "${arn}:*"]])
+      }
+    ]
+  })
+}
+
+# Batched dedup lookups, bulk writes and the id-only index scan
+# against the leads table
+resource "aws_iam_role_policy" "leads_batch_access" {
+  name = "speaking-leads-batch-access"
+  role = data.aws_iam_role.lambda_exec.name
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:BatchGetItem",
+          "dynamodb:BatchWriteItem",
+          "dynamodb:Scan",
+        ]
+        Resource = data.aws_dynamodb_table.speaking_leads.arn
+      }
+    ]
+  })
+}
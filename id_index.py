@@ -0,0 +1,160 @@
+import os
+import math
+import time
+import struct
+import hashlib
+import logging
+import threading
+
+import botocore.exceptions
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Where the known-ID index is loaded from:
+#   "scan" -> projected id-only scan of the leads table
+#   "off"  -> no index, every lookup goes to DynamoDB
+ID_INDEX_SOURCE = os.getenv("ID_INDEX_SOURCE", "scan")
+
+# Sized for this many IDs at this false-positive rate (~180 KB at 100k / 1%)
+ID_INDEX_CAPACITY = int(os.getenv("ID_INDEX_CAPACITY", "100000"))
+ID_INDEX_ERROR_RATE = float(os.getenv("ID_INDEX_ERROR_RATE", "0.01"))
+
+# Tables with more items than this are not indexed: the load scan reads
+# (and is billed for) the whole table, and the filter is sized for
+# ID_INDEX_CAPACITY
+ID_INDEX_MAX_ITEMS = int(os.getenv("ID_INDEX_MAX_ITEMS", str(ID_INDEX_CAPACITY)))
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string IDs.
+    might_contain() is False only for IDs that were never added.
+    """
+
+    def __init__(self, capacity: int = ID_INDEX_CAPACITY, error_rate: float = ID_INDEX_ERROR_RATE,
+                 num_bits: int | None = None, num_hashes: int | None = None):
+        capacity = max(1, capacity)
+        if num_bits is None:
+            num_bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        if num_hashes is None:
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = num_hashes
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def _positions(self, item_id: str):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item_id.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack(">QQ", digest)
+        h2 |= 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item_id: str):
+        positions = list(self._positions(item_id))
+        with self.lock:
+            for pos in positions:
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def might_contain(self, item_id: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item_id))
+
+
+# ---------------------------------------------------
+# Loading (once per container)
+# ---------------------------------------------------
+class IndexTooLarge(Exception):
+    """The table holds more than ID_INDEX_MAX_ITEMS items."""
+
+
+# table name -> BloomFilter, or None when it could not be loaded
+_indexes = {}
+# Table names whose scan is running
+_loading = set()
+_indexes_lock = threading.Lock()
+
+
+def _item_count(table) -> int | None:
+    """DescribeTable's item count (DynamoDB refreshes it about every 6 hours)."""
+    try:
+        return int(table.item_count)
+    except (AttributeError, TypeError, botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError):
+        return None
+
+
+def _load_from_scan(table) -> BloomFilter:
+    count = _item_count(table)
+    if count is not None and count > ID_INDEX_MAX_ITEMS:
+        raise IndexTooLarge(f"{count} items")
+
+    bf = BloomFilter()
+    scan_kwargs = {"ProjectionExpression": "id"}
+    while True:
+        resp = table.scan(**scan_kwargs)
+        for item in resp.get("Items", []):
+            bf.add(item["id"])
+        # The item count can be hours old
+        if bf.count > ID_INDEX_MAX_ITEMS:
+            raise IndexTooLarge(f"over {ID_INDEX_MAX_ITEMS} items")
+        start_key = resp.get("LastEvaluatedKey")
+        if not start_key:
+            return bf
+        scan_kwargs["ExclusiveStartKey"] = start_key
+
+
+def get_index(table) -> BloomFilter | None:
+    """
+    Return the known-ID index for `table`, loading it on first use.
+    Returns None when the index is disabled, too large, could not be fully
+    loaded or is still loading in another thread, in which case callers
+    must check DynamoDB for every ID.
+
+    After the load the index only learns the IDs this container saves
+    (LeadSink adds them). Leads written elsewhere since are negatives it
+    can't know about, so writes that rely on it must keep a conditional
+    put (see LeadSink(conditional=True)).
+    """
+    if ID_INDEX_SOURCE == "off":
+        return None
+
+    name = table.name
+    with _indexes_lock:
+        if name in _indexes:
+            return _indexes[name]
+        if name in _loading:
+            return None
+        _loading.add(name)
+
+    # Scanned outside the lock so other threads keep deduplicating
+    # against DynamoDB meanwhile instead of waiting
+    started = time.monotonic()
+    try:
+        index = _load_from_scan(table)
+    except IndexTooLarge as e:
+        logger.warning(f"Not indexing {name} ({e}, ID_INDEX_MAX_ITEMS={ID_INDEX_MAX_ITEMS})")
+        index = None
+    except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
+        # A partial index would give false negatives, so don't use one
+        logger.error(f"Could not load ID index for {name}: {e}")
+        index = None
+    else:
+        logger.info(
+            f"Loaded ID index for {name} from {ID_INDEX_SOURCE}: "
+            f"{index.count} ids in {time.monotonic() - started:.2f}s"
+        )
+
+    with _indexes_lock:
+        _indexes[name] = index
+        _loading.discard(name)
+    return index
+
@@ -1,14 +1,24 @@
 import os
 import json
-import re
+import asyncio
 import time
 import hashlib
 import logging
-from urllib.parse import urlparse
 
 import boto3
-import botocore.exceptions
-import requests
+
+import async_pipeline
+import domains
+import email_extract
+import fetch_pool
+import google_cse
+import http_client
+import lead_store
+import metrics
+import page_cache
+import profiling
+import state_store
+import urls
 
 # ---------------------------------------------------
 # Logging setup
@@ -43,76 +53,56 @@ SEARCH_QUERIES = [
     '"truck driver" "English language training"'
 ]
 
-EMAIL_REGEX = re.compile(
-    r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
-    re.IGNORECASE,
-)
-
-
 def normalize_domain(url: str) -> str:
     """Return just the domain like example.edu from a URL."""
-    try:
-        parsed = urlparse(url)
-        return parsed.netloc.lower()
-    except Exception:
-        return ""
+    # Registrable domain: www./subdomains and ports collapse (see domains.py)
+    return domains.site_of(url)
 
 
-def google_search(query: str, start: int = 1, num: int = 10):
-    """Call Google Custom Search API and return list of items."""
+def google_search(query: str, num: int = 10, known_links=None):
+    """
+    Yield Google Custom Search results for a query, up to CSE_MAX_PAGES
+    pages, fetched lazily (see google_cse.iter_results).
+    """
     if not GOOGLE_API_KEY or not GOOGLE_CX:
         logger.error("Missing GOOGLE_API_KEY or GOOGLE_CX environment variables.")
-        return []
-
-    params = {
-        "key": GOOGLE_API_KEY,
-        "cx": GOOGLE_CX,
-        "q": query,
-        "start": start,
-        "num": num,
-    }
+        return
+
     try:
-        resp = requests.get(
-            "https://www.googleapis.com/customsearch/v1",
-            params=params,
-            timeout=15,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("items", [])
+        # Cached, quota-counted calls (see google_cse.py)
+        yield from google_cse.iter_results(query, num=num, known_links=known_links)
+    except google_cse.QuotaExceeded:
+        raise
     except Exception as e:
         logger.exception(f"Google search failed for query={query}: {e}")
-        return []
 
 
-def fetch_page(url: str) -> str:
-    """Download the HTML for a page (best-effort)."""
+def fetch_page_emails(url: str):
+    """Stream a page and return the set of emails on it (best-effort)."""
     try:
-        resp = requests.get(url, timeout=15)
-        if "text/html" not in resp.headers.get("Content-Type", ""):
-            return ""
-        return resp.text
+        # Revalidated against the last crawl (see page_cache.py)
+        return set(page_cache.scan_emails(url, timeout=15))
     except Exception as e:
         logger.info(f"Failed to fetch page {url}: {e}")
-        return ""
+        return set()
 
 
 def extract_emails_from_text(text: str):
     """Return a set of unique email addresses found in text."""
     if not text:
         return set()
-    emails = set(EMAIL_REGEX.findall(text))
-    return emails
+    # Shared extractor: mailto:, Cloudflare and "[at]" forms included
+    return set(email_extract.extract_emails(text))
 
 
-def generate_id(email: str, url: str) -> str:
+def generate_id(email: str, url: str, agent: str = AGENT_NAME) -> str:
     """Stable ID so we don’t insert duplicates for same email+url+agent."""
-    raw = f"{email}|{url}|{AGENT_NAME}"
+    raw = f"{email}|{urls.url_key(url)}|{agent}"
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-def save_lead(email: str, url: str, title: str, snippet: str) -> bool:
-    """Save a lead to DynamoDB (if not already there)."""
+def save_lead(sink, email: str, url: str, title: str, snippet: str):
+    """Queue a lead on the sink; it is written only if not already there."""
     item_id = generate_id(email, url)
     domain = normalize_domain(url)
     now = int(time.time())
@@ -129,68 +119,139 @@ def save_lead(email: str, url: str, title: str, snippet: str) -> bool:
         "created_at": now,
     }
 
-    try:
-        table.put_item(
-            Item=item,
-            ConditionExpression="attribute_not_exists(id)",
-        )
-        logger.info(f"Saved new lead: {email} ({url})")
-        return True
-    except botocore.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
-            logger.info(f"Duplicate lead skipped: {email} ({url})")
-            return False
-        logger.exception(f"Error saving lead {email} ({url}): {e}")
-        return False
+    logger.info(f"Queued lead: {email} ({url})")
+    sink.add(item)
+
+
+def save_result(sink, item: dict, emails) -> None:
+    """Queue one lead per email found for a search result."""
+    link = item.get("link")
+    title = item.get("title", "")
+    snippet = item.get("snippet", "")
+
+    # Fallback: also search title/snippet text if page fails
+    if not emails:
+        fallback_text = " ".join([title, snippet])
+        emails = extract_emails_from_text(fallback_text)
+
+    if not emails:
+        logger.info(f"No emails found for {link}")
+        return
+
+    for email in emails:
+        save_lead(sink, email, link, title, snippet)
+
+
+def finish_run(sink) -> int:
+    total_saved = sink.close()
+    logger.info(f"Truck ESL agent finished. Total leads saved: {total_saved}")
+    http_client.log_connection_stats(AGENT_NAME)
+    page_cache.log_stats(AGENT_NAME)
+    logger.info(f"Google CSE stats: {google_cse.run_stats()}")
+    state_store.flush()
+    return total_saved
 
 
-def run_truck_esl_agent() -> int:
+def run_truck_esl_agent(context=None) -> int:
     """
     Main logic:
     - run several Google searches
     - fetch pages
     - extract emails
-    - store them in DynamoDB
+    - store them in DynamoDB (conditional puts, flushed in parallel)
+
+    With ASYNC_PIPELINE=1 (and httpx installed) this runs
+    run_truck_esl_agent_async instead.
     """
-    total_saved = 0
+    metrics.set_agent(AGENT_NAME)
+    if async_pipeline.enabled():
+        return asyncio.run(run_truck_esl_agent_async(context))
+
+    google_cse.start_run()
+    sink = lead_store.LeadSink(table, conditional=True, context=context, label=AGENT_NAME)
+
+    # Lead IDs depend on the email, so "known" here means already
+    # processed in this run (queries overlap heavily); keyed by urls.url_key
+    seen_links = set()
+
+    def known_links(links):
+        return {link for link in links if urls.url_key(link) in seen_links}
 
     for query in SEARCH_QUERIES:
         logger.info(f"Running Google search for query: {query}")
-        items = google_search(query, start=1, num=10)
-        logger.info(f"Google search for '{query}' returned {len(items)} items")
+        count = 0
+        try:
+            for item in google_search(query, num=10, known_links=known_links):
+                count += 1
+                link = item.get("link")
+                if not link or urls.url_key(link) in seen_links:
+                    continue
+                seen_links.add(urls.url_key(link))
 
-        for item in items:
-            link = item.get("link")
-            title = item.get("title", "")
-            snippet = item.get("snippet", "")
+                # Try to fetch the page and pull emails from the HTML body
+                save_result(sink, item, fetch_page_emails(link))
+        except google_cse.QuotaExceeded as e:
+            logger.warning(f"Stopping searches early: {e}")
+            break
+        logger.info(f"Google search for '{query}' returned {count} items")
 
-            if not link:
-                continue
+        # No fixed pause between queries: http_client spaces requests per
+        # host (Google CSE and each site) with token buckets
 
-            # Try to fetch the page and pull emails from the HTML body
-            page_text = fetch_page(link)
-            emails = extract_emails_from_text(page_text)
+    return finish_run(sink)
 
-            # Fallback: also search title/snippet text if page fails
-            if not emails:
-                fallback_text = " ".join([title, snippet])
-                emails = extract_emails_from_text(fallback_text)
 
-            if not emails:
-                logger.info(f"No emails found for {link}")
-                continue
+async def run_truck_esl_agent_async(context=None) -> int:
+    """
+    asyncio version of run_truck_esl_agent: all searches, then all page
+    fetches, run as coroutines (see async_pipeline.py).
+    """
+    metrics.set_agent(AGENT_NAME)
+    if not GOOGLE_API_KEY or not GOOGLE_CX:
+        logger.error("Missing GOOGLE_API_KEY or GOOGLE_CX environment variables.")
+        return 0
+
+    deadline = fetch_pool.make_deadline()
+    google_cse.start_run()
+    sink = lead_store.LeadSink(table, conditional=True, context=context, label=AGENT_NAME)
+
+    async with async_pipeline.AsyncFetcher() as fetcher:
+        # Queries run concurrently, so there is no "seen in this run" set
+        # to stop on yet; pagination still stops on short pages
+        searches = await asyncio.gather(
+            *(fetcher.search_pages(query, num=10) for query in SEARCH_QUERIES),
+            return_exceptions=True,
+        )
 
-            for email in emails:
-                if save_lead(email, link, title, snippet):
-                    total_saved += 1
+        results = []
+        seen_links = set()
+        for query, items in zip(SEARCH_QUERIES, searches):
+            if isinstance(items, Exception):
+                logger.warning(f"Google search failed for query={query}: {items}")
+                continue
+            logger.info(f"Google search for '{query}' returned {len(items)} items")
+            for item in items:
+                link = item.get("link")
+                if link and urls.url_key(link) not in seen_links:
+                    seen_links.add(urls.url_key(link))
+                    results.append(item)
+
+        page_emails = await async_pipeline.gather_until(
+            {item["link"]: fetcher.all_emails(item["link"]) for item in results},
+            deadline,
+        )
 
-        # small pause between queries to be polite
-        time.sleep(1)
+    def save_all():
+        for item in results:
+            if item["link"] in page_emails:
+                save_result(sink, item, set(page_emails[item["link"]]))
+        return finish_run(sink)
 
-    logger.info(f"Truck ESL agent finished. Total leads saved: {total_saved}")
-    return total_saved
+    return await asyncio.to_thread(save_all)
 
 
+@metrics.handler
+@profiling.handler
 def truck_esl_handler(event, context):
     """
     Lambda entrypoint.
@@ -199,7 +260,7 @@ def truck_esl_handler(event, context):
         handler = "lambda.truck_esl_handler"
     """
     logger.info("Truck ESL handler invoked")
-    saved = run_truck_esl_agent()
+    saved = run_truck_esl_agent(context)
     body = {
         "message": "Truck ESL agent completed.",
         "saved": saved,
@@ -11,6 +11,10 @@ locals {
 
     # If your lambda.py reads TABLE_NAME from env, you can enable this:
     # TABLE_NAME = "speaking-leads-v3-multi"
+
+    # Google CSE response cache + daily quota counter (state_store.py)
+    STATE_TABLE_NAME = aws_dynamodb_table.agent_state.name
+    CSE_DAILY_QUOTA  = "100"
   }
 }
 
@@ -1,14 +1,29 @@
 import os
 import json
-import re
+import asyncio
 import time
 import hashlib
 import logging
-from urllib.parse import urlparse
+import itertools
 
 import boto3
-import botocore.exceptions
-import requests
+
+import async_pipeline
+import checkpoint
+import domain_email_cache
+import domains
+import email_score
+import fanout
+import fetch_pool
+import google_cse
+import http_client
+import id_index
+import lead_store
+import metrics
+import page_cache
+import profiling
+import state_store
+import urls
 
 # ---------------------------------------------------
 # Logging setup
@@ -581,456 +596,705 @@ def google_search(query: str, num: int = 5):
     """Call Google Custom Search and return items list."""
     logger.info(f"Searching Google: {query}")
 
-    params = {
-        "key": GOOGLE_API_KEY,
-        "cx": GOOGLE_CX,
-        "q": query,
-        "num": num,
-    }
+    # Cached, quota-counted call (see google_cse.py)
+    return google_cse.search(query, num=num)
+
+
+def results_wanted(cfg: dict) -> int:
+    """Results per query: max_results_per_query, from at most CSE_MAX_PAGES pages."""
+    return min(cfg["max_results_per_query"], google_cse.CSE_MAX_PAGES * google_cse.CSE_PAGE_SIZE)
 
-    resp = requests.get("https://www.googleapis.com/customsearch/v1", params=params, timeout=15)
-    resp.raise_for_status()
-    data = resp.json()
-    return data.get("items", [])
+
+def search_pages(query: str, agent_name: str, wanted: int, checked: dict | None = None,
+                 stop_early: bool = True) -> list:
+    """
+    The first `wanted` results for a query, in full pages of 10 so they
+    take as few quota-counted calls as possible. Stops as soon as a page
+    holds only URLs this agent has already stored, unless stop_early is
+    False. IDs looked up on the way are recorded in `checked` (see
+    known_links).
+    """
+    logger.info(f"Searching Google: {query}")
+    results = google_cse.iter_results(
+        query,
+        pages=google_cse.pages_for(wanted),
+        num=google_cse.CSE_PAGE_SIZE,
+        known_links=(lambda links: known_links(links, agent_name, checked)) if stop_early else None,
+    )
+    return list(itertools.islice(results, wanted))
 
 
-def fetch_html(url: str) -> str | None:
-    """Fetch raw HTML for a URL."""
+def fetch_early_emails(url: str) -> list:
+    """
+    Stream a page and return its emails, stopping the download once a
+    likely contact shows up (see email_extract.ChunkScanner).
+    """
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (compatible; SpeakingAgent/1.0; +https://example.com)"
-        }
-        resp = requests.get(url, headers=headers, timeout=15)
-        resp.raise_for_status()
-        return resp.text
+        # Revalidated against the last crawl (see page_cache.py)
+        return page_cache.scan_emails(url, first_match=True, timeout=15)
     except Exception as e:
         logger.warning(f"Error fetching HTML from {url}: {e}")
-        return None
-
-
-def find_email_in_text(text: str) -> str | None:
-    """Very simple email finder from raw text."""
-    if not text:
-        return None
+        return []
 
-    # Basic email regex
-    pattern = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
-    matches = re.findall(pattern, text)
-    if not matches:
-        return None
 
-    # Return the first one for now
-    return matches[0]
+def fetch_first_email(url: str) -> str | None:
+    """Best-scoring email of a page (see email_score.py)."""
+    return email_score.best_email(url, fetch_early_emails(url))
 
 
 def extract_domain(url: str) -> str:
-    """Extract domain from URL."""
-    parsed = urlparse(url)
-    return parsed.netloc
+    """Extract the registrable domain (e.g. mines.edu) from a URL."""
+    # Every subdomain of a school shares one fallback search and cache entry
+    return domains.site_of(url)
 
 
 def google_search_for_domain_email(domain: str) -> str | None:
     """
     Fallback: search Google again limited to this domain,
     grab first page, try to extract email.
-    """
-    fallback_query = f'site:{domain} "email" "contact"'
-    logger.info(f"Fallback search on domain: {domain} with query: {fallback_query}")
-    try:
-        items = google_search(fallback_query, num=3)
-    except Exception as e:
-        logger.warning(f"Error in fallback domain search for {domain}: {e}")
-        return None
-
-    for item in items:
-        link = item.get("link")
-        if not link:
-            continue
-
-        html = fetch_html(link)
-        if not html:
-            continue
-
-        email = find_email_in_text(html)
-        if email:
-            return email
 
-    return None
+    Results (including "no email found") are cached per domain, see
+    domain_email_cache.py, so the extra CSE query runs rarely.
+    """
+    cached = domain_email_cache.get(domain)
+    if cached is not None:
+        logger.info(f"Fallback cache hit for domain: {domain} -> {cached.get('email')}")
+        metrics.count("fallback", "cache_hits")
+        return cached.get("email")
+
+    # Several results from one domain may reach the fallback at the same time
+    with domain_email_cache.lock_for(domain):
+        cached = domain_email_cache.get(domain)
+        if cached is not None:
+            metrics.count("fallback", "cache_hits")
+            return cached.get("email")
+
+        fallback_query = f'site:{domain} "email" "contact"'
+        logger.info(f"Fallback search on domain: {domain} with query: {fallback_query}")
+        with metrics.timed("fallback"):
+            try:
+                items = google_search(fallback_query, num=3)
+            except Exception as e:
+                # Not cached: a failed or over-quota search says nothing about the domain
+                logger.warning(f"Error in fallback domain search for {domain}: {e}")
+                metrics.count("fallback", "search_failed")
+                return None
+
+            email = None
+            for item in items:
+                link = item.get("link")
+                if not link:
+                    continue
+
+                email = fetch_first_email(link)
+                if email:
+                    break
+
+        metrics.count("fallback", "found" if email else "not_found")
+        domain_email_cache.put(domain, email)
+        return email
 
 
 def make_id(url: str, agent_name: str) -> str:
-    """Deterministic ID from URL + agent name."""
+    """Deterministic ID from canonical URL (urls.url_key) + agent name."""
     h = hashlib.sha256()
-    h.update((url + "|" + agent_name).encode("utf-8"))
+    h.update((urls.url_key(url) + "|" + agent_name).encode("utf-8"))
     return h.hexdigest()
 
 
-def item_exists(item_id: str) -> bool:
+def known_links(links: list, agent_name: str, checked: dict | None = None) -> set:
     """
-    Check if an item with this id already exists in DynamoDB.
-    Used for de-duplication.
+    The links this agent already has a record for. With `checked`, every
+    ID looked up is recorded there (id -> exists) so collect_candidates
+    doesn't query DynamoDB for it again.
     """
-    try:
-        resp = table.get_item(Key={"id": item_id})
-        return "Item" in resp
-    except botocore.exceptions.ClientError as e:
-        logger.error(f"Error checking existence in DynamoDB for id={item_id}: {e}")
-        # Fail open: if we can't check, we'll treat it as not existing
-        return False
+    ids = {make_id(link, agent_name): link for link in links}
+    existing = lead_store.batch_existing_ids(table, list(ids), index=id_index.get_index(table))
+    if checked is not None:
+        checked.update((item_id, item_id in existing) for item_id in ids)
+    return {ids[item_id] for item_id in existing}
 
 
-def save_to_dynamodb(item: dict, agent_name: str) -> bool:
-    """Save item to DynamoDB, return True on success."""
-    try:
-        table.put_item(Item=item)
-        return True
-    except botocore.exceptions.ClientError as e:
-        logger.error(f"[{agent_name}] Error saving to DynamoDB: {e}")
-        return False
+def find_contact_email(url: str, agent_name: str = "") -> list:
+    """
+    Fetch a result page and return its candidate contact emails; the
+    run picks one per page with email_score.choose_batch.
+    Falls back to a domain-limited Google search if the page has none.
+    """
+    # Try to get emails from the main page (stops reading early)
+    emails = fetch_early_emails(url)
 
+    # If no email on main page, try fallback domain search
+    if not emails:
+        domain = extract_domain(url)
+        logger.info(f"[{agent_name}] No email on main page. Fallback search on domain: {domain}")
+        email = google_search_for_domain_email(domain)
+        emails = [email] if email else []
 
-def run_agent(agent_name: str, context: dict | None = None) -> dict:
-    """
-    Generic runner for all agents.
-    agent_name must exist in AGENTS keys.
+    return emails
 
-    Behavior:
-    - Skip duplicates (if id already exists in DynamoDB)
-    - Only save items that have a non-empty contact_email
-    """
-    if agent_name not in AGENTS:
-        raise ValueError(f"Unknown agent: {agent_name}")
 
-    cfg = AGENTS[agent_name]
-    total_saved = 0
+def resumes_mid_query(start: tuple, query_index: int) -> bool:
+    """
+    True for the query a cursor points into. The earlier invocation stored
+    the results before the cursor, so their pages are all known links, yet
+    the results from the cursor on still need the pages after them.
+    """
+    return query_index == start[0] and start[1] > 0
 
-    logger.info(f"[{agent_name}] Starting run.")
 
-    for q in cfg["search_queries"]:
-        try:
-            items = google_search(q, num=cfg["max_results_per_query"])
-        except Exception as e:
-            logger.error(f"[{agent_name}] Error during Google search: {e}")
-            continue
+def collect_candidates(agent_name: str, result_lists, start: tuple = (0, 0),
+                       checked: dict | None = None) -> tuple:
+    """
+    Turn search results ((query_index, items) per query, in query order)
+    into the (item_id, url, title, position) candidates that still need
+    fetching. position is (query_index, result_index); results before
+    `start` were handled by an earlier invocation and are dropped.
+    IDs already in `checked` (looked up during the search) are not
+    looked up again.
+    Returns (candidates, index) where index is the known-ID index, if any.
+    """
+    candidates = []
+    seen_ids = set()
+    for query_index, items in result_lists:
+        for result_index, result in enumerate(items):
+            if (query_index, result_index) < start:
+                continue
 
-        for result in items:
             url = result.get("link")
             title = result.get("title")
 
             if not url:
                 continue
 
-            logger.info(f"[{agent_name}] Processing URL: {url}")
-
             # Build deterministic ID for de-dupe
             item_id = make_id(url, agent_name)
 
-            # De-duplication: skip if already in DynamoDB
-            if item_exists(item_id):
-                logger.info(f"[{agent_name}] Skipping duplicate URL (already in table): {url}")
+            # Same URL returned by several queries in this run
+            if item_id in seen_ids:
                 continue
+            seen_ids.add(item_id)
 
-            # Try to get email from the main page
-            html = fetch_html(url)
-            email = find_email_in_text(html) if html else None
-
-            # If no email on main page, try fallback domain search
-            if not email:
-                domain = extract_domain(url)
-                logger.info(f"[{agent_name}] No email on main page. Fallback search on domain: {domain}")
-                email = google_search_for_domain_email(domain)
-
-            # If still no email, skip saving this record
-            if not email:
-                logger.info(f"[{agent_name}] No email found even after fallback. Skipping URL: {url}")
-                continue
-
-            # Build the item
-            item = {
-                "id": item_id,
-                "url": url,
-                "title": title or "",
-                "contact_email": email,
-                "source": agent_name,
-                "scraped_at": int(time.time()),
-            }
-
-            logger.info(f"[{agent_name}] Saving item to DynamoDB: {url}")
-            if save_to_dynamodb(item, agent_name):
-                total_saved += 1
-            else:
-                logger.error(
-                    f"[{agent_name}] Error processing result: failed to save item for URL {url}"
-                )
-
-    logger.info(f"[{agent_name}] Finished. Saved {total_saved} items.")
-    return {
-        "message": f"{agent_name} ran successfully. Saved {total_saved} items.",
-        "saved": total_saved,
-        "source": agent_name,
-    }
-
-
-def make_response(body: dict, status_code: int = 200) -> dict:
-    return {
-        "statusCode": status_code,
-        "body": json.dumps(body),
-    }
-
-
-# ---------------------------------------------------
-# Lambda handlers (Terraform points to these)
-# ---------------------------------------------------
-
-def student_athlete_handler(event, context):
-    body = run_agent("student_athlete_leadership_agent", event)
-    return make_response(body)
-
-
-def men_of_color_handler(event, context):
-    body = run_agent("men_of_color_initiative_agent", event)
-    return make_response(body)
-
-
-def first_gen_handler(event, context):
-    body = run_agent("first_gen_student_success_agent", event)
-    return make_response(body)
-
-
-def multicultural_center_handler(event, context):
-    body = run_agent("multicultural_center_leadership_agent", event)
-    return make_response(body)
-
-
-def service_learning_handler(event, context):
-    body = run_agent("service_learning_civic_engagement_agent", event)
-    return make_response(body)
-
-
-def hs_student_council_handler(event, context):
-    body = run_agent("hs_student_council_leadership_agent", event)
-    return make_response(body)
-
-
-def summer_bridge_handler(event, context):
-    body = run_agent("summer_bridge_orientation_agent", event)
-    return make_response(body)
-
-
-def sga_leadership_handler(event, context):
-    body = run_agent("sga_leadership_agent", event)
-    return make_response(body)
-
-
-def student_leadership_retreat_handler(event, context):
-    body = run_agent("student_leadership_retreat_agent", event)
-    return make_response(body)
-
-
-def student_leadership_conference_handler(event, context):
-    body = run_agent("student_leadership_conference_agent", event)
-    return make_response(body)
-
-
-def leadership_summit_handler(event, context):
-    body = run_agent("leadership_summit_agent", event)
-    return make_response(body)
-
-
-def officer_training_handler(event, context):
-    body = run_agent("officer_training_agent", event)
-    return make_response(body)
-
+            candidates.append((item_id, url, title, (query_index, result_index)))
 
-def speaker_series_lyceum_handler(event, context):
-    body = run_agent("speaker_series_lyceum_agent", event)
-    return make_response(body)
-
-
-def orientation_leader_handler(event, context):
-    body = run_agent("orientation_leader_agent", event)
-    return make_response(body)
-
-
-def res_life_ra_leadership_handler(event, context):
-    body = run_agent("res_life_ra_leadership_agent", event)
-    return make_response(body)
+    # De-duplication: the known-ID index rules out most IDs, the rest are
+    # confirmed with one batched lookup instead of a get_item per URL
+    checked = checked or {}
+    index = id_index.get_index(table)
+    existing = lead_store.batch_existing_ids(
+        table, [c[0] for c in candidates if c[0] not in checked], index=index
+    )
+    existing |= {item_id for item_id, found in checked.items() if found}
+    for item_id, url, _, _ in candidates:
+        if item_id in existing:
+            logger.info(f"[{agent_name}] Skipping duplicate URL (already in table): {url}")
+    return [c for c in candidates if c[0] not in existing], index
 
 
-def resident_assistant_leadership_handler(event, context):
-    body = run_agent("resident_assistant_leadership_agent", event)
-    return make_response(body)
-
-
-def campus_ambassador_events_handler(event, context):
-    body = run_agent("campus_ambassador_events_agent", event)
-    return make_response(body)
-
+def save_candidates(agent_name: str, candidates: list, emails: dict, context=None, index=None) -> int:
+    """
+    Save stage: same order as the search results, written in batches.
+    With a known-ID index the dedup pre-pass trusted its negatives, which
+    miss leads saved elsewhere since it was loaded, so puts stay
+    conditional instead of overwriting those leads.
+    """
+    sink = lead_store.LeadSink(
+        table, conditional=index is not None, context=context, label=agent_name, index=index
+    )
+    for item_id, url, title, _ in candidates:
+        logger.info(f"[{agent_name}] Processing URL: {url}")
+
+        if url not in emails:
+            logger.warning(f"[{agent_name}] URL not fetched before deadline. Skipping URL: {url}")
+            continue
 
-def sophomore_leadership_handler(event, context):
-    body = run_agent("sophomore_leadership_agent", event)
-    return make_response(body)
+        email = emails[url]
 
+        # If still no email, skip saving this record
+        if not email:
+            logger.info(f"[{agent_name}] No email found even after fallback. Skipping URL: {url}")
+            continue
 
-def honors_program_leadership_handler(event, context):
-    body = run_agent("honors_program_leadership_agent", event)
-    return make_response(body)
+        # Build the item
+        item = {
+            "id": item_id,
+            "url": url,
+            "title": title or "",
+            "contact_email": email,
+            "source": agent_name,
+            "scraped_at": int(time.time()),
+        }
 
+        logger.info(f"[{agent_name}] Saving item to DynamoDB: {url}")
+        sink.add(item)
 
-def leadership_certificate_program_handler(event, context):
-    body = run_agent("leadership_certificate_program_agent", event)
-    return make_response(body)
+    return sink.close()
 
 
-def leadership_academy_handler(event, context):
-    body = run_agent("leadership_academy_agent", event)
-    return make_response(body)
+def resume_position(candidates: list, emails: dict, deadline: float) -> tuple | None:
+    """
+    First (query_index, result_index) left unfetched because the deadline
+    hit, or None when the agent got through all of its results.
+    """
+    if time.monotonic() < deadline:
+        return None
+    unfinished = [pos for _, url, _, pos in candidates if url not in emails]
+    return min(unfinished) if unfinished else None
 
 
-def student_activities_leadership_handler(event, context):
-    body = run_agent("student_activities_leadership_agent", event)
-    return make_response(body)
+def finish_run(agent_name: str, total_saved: int, resume_from: tuple | None = None) -> dict:
+    logger.info(f"[{agent_name}] Finished. Saved {total_saved} items.")
+    http_client.log_connection_stats(agent_name)
+    page_cache.log_stats(agent_name)
+    logger.info(f"[{agent_name}] Google CSE stats: {google_cse.run_stats()}")
+    state_store.flush()
+    body = {
+        "message": f"{agent_name} ran successfully. Saved {total_saved} items.",
+        "saved": total_saved,
+        "source": agent_name,
+    }
+    if resume_from is not None:
+        logger.warning(f"[{agent_name}] Out of time; unfinished from position {resume_from}")
+        body["resume_from"] = {"query_index": resume_from[0], "result_index": resume_from[1]}
+    return body
 
 
-def college_success_leadership_handler(event, context):
-    body = run_agent("college_success_leadership_agent", event)
-    return make_response(body)
+def run_agent(agent_name: str, context=None, run_cache: fetch_pool.RunCache | None = None,
+              cursor: dict | None = None, query_indexes: list | None = None) -> dict:
+    """
+    Generic runner for all agents.
+    agent_name must exist in AGENTS keys.
 
+    run_cache is shared between agents in one dispatcher run so a page
+    returned for several agents is only fetched once.
 
-def career_success_leadership_handler(event, context):
-    body = run_agent("career_success_leadership_agent", event)
-    return make_response(body)
+    cursor resumes an agent an earlier invocation ran out of time on (see
+    checkpoint.py). If this run runs out of time too, the result carries
+    "resume_from" with the position to continue from.
 
+    query_indexes limits the run to those search queries (a fan-out shard).
 
-def social_justice_leadership_handler(event, context):
-    body = run_agent("social_justice_leadership_agent", event)
-    return make_response(body)
+    Behavior:
+    - Skip duplicates (if id already exists in DynamoDB, checked in batches)
+    - Fetch all new result pages concurrently (see fetch_pool.py)
+    - Only save items that have a non-empty contact_email
 
+    With ASYNC_PIPELINE=1 (and httpx installed) the same stages run as
+    coroutines instead, see run_agent_async.
+    """
+    if agent_name not in AGENTS:
+        raise ValueError(f"Unknown agent: {agent_name}")
+    metrics.set_agent(agent_name)
 
-def cc_student_leadership_handler(event, context):
-    body = run_agent("cc_student_leadership_agent", event)
-    return make_response(body)
+    if async_pipeline.enabled():
+        return asyncio.run(run_agent_async(agent_name, context, run_cache, cursor, query_indexes))
 
+    cfg = AGENTS[agent_name]
+    start = checkpoint.position(cursor)
+
+    logger.info(f"[{agent_name}] Starting run" + (f" from position {start}." if cursor else "."))
+    deadline = checkpoint.make_deadline(context)
+    google_cse.start_run()
+
+    # Search stage: collect every new result before fetching anything
+    # (cached for days, so a resumed run sees the same result positions)
+    result_lists = []
+    checked = {}
+    for query_index, q in enumerate(cfg["search_queries"]):
+        if query_index < start[0]:
+            continue
+        if query_indexes is not None and query_index not in query_indexes:
+            continue
+        try:
+            result_lists.append((query_index, search_pages(
+                q, agent_name, results_wanted(cfg), checked,
+                stop_early=not resumes_mid_query(start, query_index),
+            )))
+        except google_cse.QuotaExceeded as e:
+            logger.warning(f"[{agent_name}] Stopping searches early: {e}")
+            break
+        except Exception as e:
+            logger.error(f"[{agent_name}] Error during Google search: {e}")
+            continue
 
-def cc_success_and_retention_handler(event, context):
-    body = run_agent("cc_success_and_retention_agent", event)
-    return make_response(body)
+    candidates, index = collect_candidates(agent_name, result_lists, start, checked)
 
+    # Fetch stage: pages (and fallback searches) run in parallel
+    logger.info(f"[{agent_name}] Fetching {len(candidates)} URLs.")
+    page_emails = fetch_pool.fetch_all(
+        [c[1] for c in candidates],
+        lambda url: find_contact_email(url, agent_name),
+        deadline,
+        cache=run_cache,
+    )
 
-# ---- Existing 10 handlers ----
+    # One contact per page, scored across all of this run's pages
+    emails = email_score.choose_batch(page_emails)
+    total_saved = save_candidates(agent_name, candidates, emails, context, index)
+    return finish_run(agent_name, total_saved, resume_position(candidates, emails, deadline))
 
-def hs_student_leadership_conferences_handler(event, context):
-    body = run_agent("hs_student_leadership_conferences_agent", event)
-    return make_response(body)
 
+async def run_agent_async(agent_name: str, context=None, run_cache: fetch_pool.RunCache | None = None,
+                          cursor: dict | None = None, query_indexes: list | None = None) -> dict:
+    """
+    asyncio version of run_agent: searches, page fetches and fallback
+    searches run as coroutines on one httpx client (see async_pipeline.py).
+    DynamoDB work stays in boto3 and runs in worker threads.
+    """
+    if agent_name not in AGENTS:
+        raise ValueError(f"Unknown agent: {agent_name}")
+    metrics.set_agent(agent_name)
 
-def hs_faculty_staff_training_handler(event, context):
-    body = run_agent("hs_faculty_staff_training_agent", event)
-    return make_response(body)
+    cfg = AGENTS[agent_name]
+    start = checkpoint.position(cursor)
+    queries = [
+        (query_index, q) for query_index, q in enumerate(cfg["search_queries"])
+        if query_index >= start[0] and (query_indexes is None or query_index in query_indexes)
+    ]
+
+    logger.info(f"[{agent_name}] Starting async run" + (f" from position {start}." if cursor else "."))
+    deadline = checkpoint.make_deadline(context)
+    google_cse.start_run()
+
+    async with async_pipeline.AsyncFetcher() as fetcher:
+        # Search stage: all queries at once, in full pages (see search_pages)
+        wanted = results_wanted(cfg)
+        checked = {}
+        searches = await asyncio.gather(
+            *(
+                fetcher.search_pages(
+                    q,
+                    pages=google_cse.pages_for(wanted),
+                    num=google_cse.CSE_PAGE_SIZE,
+                    known_links=None if resumes_mid_query(start, query_index) else (
+                        lambda links: known_links(links, agent_name, checked)
+                    ),
+                )
+                for query_index, q in queries
+            ),
+            return_exceptions=True,
+        )
+        result_lists = []
+        for (query_index, q), items in zip(queries, searches):
+            if isinstance(items, google_cse.QuotaExceeded):
+                logger.warning(f"[{agent_name}] Search skipped, {items}: {q}")
+            elif isinstance(items, Exception):
+                logger.error(f"[{agent_name}] Error during Google search: {items}")
+            else:
+                result_lists.append((query_index, items[:wanted]))
 
+        candidates, index = await asyncio.to_thread(
+            collect_candidates, agent_name, result_lists, start, checked
+        )
 
-def transfer_student_leadership_handler(event, context):
-    body = run_agent("transfer_student_leadership_agent", event)
-    return make_response(body)
+        async def contact_emails(url: str) -> list:
+            if run_cache is not None:
+                hit, emails = run_cache.peek(url)
+                if hit:
+                    return emails
 
+            emails = await fetcher.early_emails(url)
+            if not emails:
+                domain = extract_domain(url)
+                logger.info(f"[{agent_name}] No email on main page. Fallback search on domain: {domain}")
+                email = await fetcher.domain_fallback_email(domain)
+                emails = [email] if email else []
 
-def trio_leadership_handler(event, context):
-    body = run_agent("trio_leadership_agent", event)
-    return make_response(body)
+            if run_cache is not None:
+                run_cache.store(url, emails)
+            return emails
 
+        # Fetch stage: one coroutine per page, bounded by the fetcher's semaphores
+        logger.info(f"[{agent_name}] Fetching {len(candidates)} URLs.")
+        page_emails = await async_pipeline.gather_until(
+            {c[1]: contact_emails(c[1]) for c in candidates},
+            deadline,
+        )
 
-def greek_life_leadership_handler(event, context):
-    body = run_agent("greek_life_leadership_agent", event)
-    return make_response(body)
+    emails = email_score.choose_batch(page_emails)
+    total_saved = await asyncio.to_thread(save_candidates, agent_name, candidates, emails, context, index)
+    return finish_run(agent_name, total_saved, resume_position(candidates, emails, deadline))
 
 
-def peer_mentor_leadership_handler(event, context):
-    body = run_agent("peer_mentor_leadership_agent", event)
-    return make_response(body)
+def make_response(body: dict, status_code: int = 200) -> dict:
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(body),
+    }
 
 
-def women_in_leadership_handler(event, context):
-    body = run_agent("women_in_leadership_agent", event)
-    return make_response(body)
+# ---------------------------------------------------
+# Lambda handlers (Terraform points to these)
+# ---------------------------------------------------
+# handler name -> agent name. Each entry becomes a module-level
+# `<name>(event, context)` function so existing Terraform handler
+# strings keep working; new deployments should use dispatch_handler.
+HANDLERS = {
+    "student_athlete_handler": "student_athlete_leadership_agent",
+    "men_of_color_handler": "men_of_color_initiative_agent",
+    "first_gen_handler": "first_gen_student_success_agent",
+    "multicultural_center_handler": "multicultural_center_leadership_agent",
+    "service_learning_handler": "service_learning_civic_engagement_agent",
+    "hs_student_council_handler": "hs_student_council_leadership_agent",
+    "summer_bridge_handler": "summer_bridge_orientation_agent",
+    "sga_leadership_handler": "sga_leadership_agent",
+    "student_leadership_retreat_handler": "student_leadership_retreat_agent",
+    "student_leadership_conference_handler": "student_leadership_conference_agent",
+    "leadership_summit_handler": "leadership_summit_agent",
+    "officer_training_handler": "officer_training_agent",
+    "speaker_series_lyceum_handler": "speaker_series_lyceum_agent",
+    "orientation_leader_handler": "orientation_leader_agent",
+    "res_life_ra_leadership_handler": "res_life_ra_leadership_agent",
+    "resident_assistant_leadership_handler": "resident_assistant_leadership_agent",
+    "campus_ambassador_events_handler": "campus_ambassador_events_agent",
+    "sophomore_leadership_handler": "sophomore_leadership_agent",
+    "honors_program_leadership_handler": "honors_program_leadership_agent",
+    "leadership_certificate_program_handler": "leadership_certificate_program_agent",
+    "leadership_academy_handler": "leadership_academy_agent",
+    "student_activities_leadership_handler": "student_activities_leadership_agent",
+    "college_success_leadership_handler": "college_success_leadership_agent",
+    "career_success_leadership_handler": "career_success_leadership_agent",
+    "social_justice_leadership_handler": "social_justice_leadership_agent",
+    "cc_student_leadership_handler": "cc_student_leadership_agent",
+    "cc_success_and_retention_handler": "cc_success_and_retention_agent",
+
+    # ---- Existing 10 handlers ----
+    "hs_student_leadership_conferences_handler": "hs_student_leadership_conferences_agent",
+    "hs_faculty_staff_training_handler": "hs_faculty_staff_training_agent",
+    "transfer_student_leadership_handler": "transfer_student_leadership_agent",
+    "trio_leadership_handler": "trio_leadership_agent",
+    "greek_life_leadership_handler": "greek_life_leadership_agent",
+    "peer_mentor_leadership_handler": "peer_mentor_leadership_agent",
+    "women_in_leadership_handler": "women_in_leadership_agent",
+    "leadership_honor_society_handler": "leadership_honor_society_agent",
+    "student_belonging_leadership_handler": "student_belonging_leadership_agent",
+    "school_improvement_leadership_handler": "school_improvement_leadership_agent",
+
+    # ---- NEW 13 handlers ----
+    "emerging_leaders_program_handler": "emerging_leaders_program_agent",
+    "leadership_capstone_handler": "leadership_capstone_agent",
+    "student_leadership_grant_handler": "student_leadership_grant_agent",
+    "intercultural_leadership_handler": "intercultural_leadership_agent",
+    "leadership_conference_rfp_handler": "leadership_conference_rfp_agent",
+    "leadership_week_handler": "leadership_week_agent",
+    "student_success_workshop_series_handler": "student_success_workshop_series_agent",
+    "leadership_institute_handler": "leadership_institute_agent",
+    "professional_development_day_handler": "professional_development_day_agent",
+    "student_engagement_conference_handler": "student_engagement_conference_agent",
+    "leadership_webinar_handler": "leadership_webinar_agent",
+    "commuter_student_leadership_handler": "commuter_student_leadership_agent",
+    "campus_leadership_innovation_handler": "campus_leadership_innovation_agent",
+}
 
 
-def leadership_honor_society_handler(event, context):
-    body = run_agent("leadership_honor_society_agent", event)
-    return make_response(body)
+def make_agent_handler(agent_name: str):
+    def handler(event, context):
+        body = run_agent(agent_name, context)
+        return make_response(body)
 
+    handler.__doc__ = f"Lambda entrypoint for {agent_name}."
+    return handler
 
-def student_belonging_leadership_handler(event, context):
-    body = run_agent("student_belonging_leadership_agent", event)
-    return make_response(body)
 
+for _handler_name, _agent_name in HANDLERS.items():
+    _handler = make_agent_handler(_agent_name)
+    _handler.__name__ = _handler_name
+    globals()[_handler_name] = metrics.handler(profiling.handler(_handler))
 
-def school_improvement_leadership_handler(event, context):
-    body = run_agent("school_improvement_leadership_agent", event)
-    return make_response(body)
 
+# ---------------------------------------------------
+# Single dispatcher entry point
+# ---------------------------------------------------
+# Don't start another agent with less than this much Lambda time left
+DISPATCH_MIN_REMAINING_SECONDS = int(os.getenv("DISPATCH_MIN_REMAINING_SECONDS", "120"))
 
-# ---- NEW 13 handlers ----
 
-def emerging_leaders_program_handler(event, context):
-    body = run_agent("emerging_leaders_program_agent", event)
-    return make_response(body)
+def resolve_agents(event: dict | None) -> list:
+    """
+    Agent names to run for a dispatcher event:
+        {"agent": "leadership_week_agent"}
+        {"agents": ["trio_leadership_agent", "leadership_summit_agent"]}
+        {"agents": "all"}  (also the default when neither key is set)
+    """
+    event = event or {}
+    requested = event.get("agents", event.get("agent", "all"))
 
+    if requested == "all":
+        return list(AGENTS)
+    if isinstance(requested, str):
+        requested = [requested]
 
-def leadership_capstone_handler(event, context):
-    body = run_agent("leadership_capstone_agent", event)
-    return make_response(body)
+    unknown = [name for name in requested if name not in AGENTS]
+    if unknown:
+        raise ValueError(f"Unknown agent(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
 
 
-def student_leadership_grant_handler(event, context):
-    body = run_agent("student_leadership_grant_agent", event)
-    return make_response(body)
+def remaining_seconds(context) -> float | None:
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return context.get_remaining_time_in_millis() / 1000
 
 
-def intercultural_leadership_handler(event, context):
-    body = run_agent("intercultural_leadership_agent", event)
-    return make_response(body)
+@metrics.handler
+@profiling.handler
+def dispatch_handler(event, context):
+    """
+    One Lambda entry point for every agent.
 
+    Runs the requested agents one after another in this container, so the
+    HTTP session, CSE cache, ID index and fetch pool are shared between
+    them instead of being rebuilt by a cold start per agent.
 
-def leadership_conference_rfp_handler(event, context):
-    body = run_agent("leadership_conference_rfp_agent", event)
-    return make_response(body)
+    Runs that don't fit in one invocation are checkpointed: the cursor
+    (agent, query index, result index) is saved to the state table and
+    the function re-invokes itself to continue from it (see checkpoint.py).
+    A scheduled run that finds a saved cursor also resumes from it.
+    """
+    event = event or {}
+    # Fan-out events can come to this same function (see fanout.py)
+    if event.get("mode") == "coordinator":
+        return coordinator_handler(event, context)
+    if event.get("mode") == "worker":
+        return worker_handler(event, context)
 
+    try:
+        agent_names = resolve_agents(event)
+    except ValueError as e:
+        return make_response({"error": str(e)}, status_code=400)
+
+    key = checkpoint.run_key(agent_names)
+    cursor = checkpoint.load(key)
+    if cursor is not None and cursor.get("agent") in agent_names:
+        logger.info(f"[dispatch] Resuming from cursor {cursor}")
+        to_run = agent_names[agent_names.index(cursor["agent"]):]
+    else:
+        cursor = None
+        to_run = agent_names
+
+    logger.info(f"[dispatch] Running {len(to_run)} agents.")
+    run_cache = fetch_pool.RunCache()
+    results = []
+    stopped_at = None
+
+    for agent_name in to_run:
+        left = remaining_seconds(context)
+        if left is not None and left < DISPATCH_MIN_REMAINING_SECONDS:
+            stopped_at = {"agent": agent_name, "query_index": 0, "result_index": 0}
+            break
+
+        agent_cursor = cursor if cursor is not None and cursor["agent"] == agent_name else None
+        if agent_cursor is None:
+            # Progress marker: if Lambda kills this invocation anyway, the
+            # next run restarts at this agent instead of the first one
+            checkpoint.save(key, {"agent": agent_name, "query_index": 0, "result_index": 0})
+        try:
+            body = run_agent(agent_name, context, run_cache=run_cache, cursor=agent_cursor)
+        except Exception as e:
+            logger.exception(f"[dispatch] Agent {agent_name} failed")
+            body = {"source": agent_name, "saved": 0, "error": str(e)}
+        results.append(body)
+
+        if body.get("resume_from"):
+            stopped_at = dict(body["resume_from"], agent=agent_name)
+            break
+
+    logger.info(f"[dispatch] Page cache stats: {run_cache.stats()}")
+
+    skipped = []
+    reinvoked = False
+    if stopped_at is not None:
+        skipped = to_run[to_run.index(stopped_at["agent"]):]
+        logger.warning(f"[dispatch] Out of time, {len(skipped)} agents left from {stopped_at}")
+        checkpoint.save(key, stopped_at)
+        reinvoked = checkpoint.reinvoke(context, event)
+    else:
+        checkpoint.clear(key)
+
+    total_saved = sum(r.get("saved", 0) for r in results)
+    return make_response({
+        "message": f"Dispatcher ran {len(results)} agents. Saved {total_saved} items.",
+        "saved": total_saved,
+        "agents": results,
+        "skipped": skipped,
+        "checkpoint": stopped_at,
+        "reinvoked": reinvoked,
+    })
 
-def leadership_week_handler(event, context):
-    body = run_agent("leadership_week_agent", event)
-    return make_response(body)
 
+# ---------------------------------------------------
+# Fan-out: one worker invocation per (agent, queries) shard
+# ---------------------------------------------------
+# Seconds the coordinator keeps for itself after waiting on shards
+FANOUT_COORDINATOR_MARGIN_SECONDS = int(os.getenv("FANOUT_COORDINATOR_MARGIN_SECONDS", "30"))
 
-def student_success_workshop_series_handler(event, context):
-    body = run_agent("student_success_workshop_series_agent", event)
-    return make_response(body)
 
+@metrics.handler
+@profiling.handler
+def coordinator_handler(event, context):
+    """
+    Split the requested agents' search queries into shards (see
+    fanout.make_shards), invoke worker_handler once per shard and return
+    a summary of the shard results that arrived in time.
 
-def leadership_institute_handler(event, context):
-    body = run_agent("leadership_institute_agent", event)
-    return make_response(body)
+        {"mode": "coordinator", "agents": "all"}
+        {"mode": "coordinator", "run_id": "..."}   (summary of an earlier run)
 
+    Worker events (which also carry a run_id) are passed to worker_handler,
+    so shards may be invoked on the coordinator's own function.
+    """
+    event = event or {}
+    if event.get("mode") == "worker":
+        return worker_handler(event, context)
 
-def professional_development_day_handler(event, context):
-    body = run_agent("professional_development_day_agent", event)
-    return make_response(body)
+    if event.get("run_id"):
+        shards = fanout.load_shards(event["run_id"])
+        if shards is None:
+            return make_response({"error": f"Unknown fan-out run: {event['run_id']}"}, status_code=404)
+        return make_response(fanout.collect(event["run_id"], shards))
 
+    try:
+        agent_names = resolve_agents(event)
+    except ValueError as e:
+        return make_response({"error": str(e)}, status_code=400)
 
-def student_engagement_conference_handler(event, context):
-    body = run_agent("student_engagement_conference_agent", event)
-    return make_response(body)
+    shards = fanout.make_shards(
+        {name: len(AGENTS[name]["search_queries"]) for name in agent_names}
+    )
 
+    try:
+        invoker = fanout.get_invoker(context, worker_handler)
+    except RuntimeError as e:
+        logger.error(f"[fanout] {e}")
+        return make_response({"error": str(e)}, status_code=500)
+    try:
+        run_id = fanout.start(invoker, shards)
+    finally:
+        invoker.close()
 
-def leadership_webinar_handler(event, context):
-    body = run_agent("leadership_webinar_agent", event)
-    return make_response(body)
+    wait = fanout.FANOUT_WAIT_SECONDS
+    left = remaining_seconds(context)
+    if left is not None:
+        wait = min(wait, left - FANOUT_COORDINATOR_MARGIN_SECONDS)
+    return make_response(fanout.collect(run_id, shards, wait_seconds=wait))
 
 
-def commuter_student_leadership_handler(event, context):
-    body = run_agent("commuter_student_leadership_agent", event)
-    return make_response(body)
+@metrics.handler
+@profiling.handler
+def worker_handler(event, context):
+    """
+    Run one fan-out shard: {"run_id", "shard": {"id", "agent", "query_indexes"}}.
+    The result is stored for the coordinator and also returned.
+    """
+    run_id = event["run_id"]
+    shard = event["shard"]
+    logger.info(f"[fanout] Worker running shard {shard['id']} of run {run_id}")
 
+    try:
+        body = run_agent(shard["agent"], context, query_indexes=shard["query_indexes"])
+    except Exception as e:
+        logger.exception(f"[fanout] Shard {shard['id']} failed")
+        body = {"source": shard["agent"], "saved": 0, "error": str(e)}
 
-def campus_leadership_innovation_handler(event, context):
-    body = run_agent("campus_leadership_innovation_agent", event)
+    fanout.put_result(run_id, shard["id"], body)
     return make_response(body)
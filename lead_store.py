@@ -0,0 +1,221 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import botocore.exceptions
+
+import metrics
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# DynamoDB limits
+BATCH_GET_MAX_KEYS = 100
+
+MAX_UNPROCESSED_RETRIES = 5
+
+
+def _chunks(seq: list, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def batch_existing_ids(table, ids, index=None) -> set:
+    """
+    Return the subset of `ids` that already exist in `table`.
+
+    Uses BatchGetItem in chunks of 100 keys, projecting only `id`, and
+    retries UnprocessedKeys with backoff. Keys that still can't be read
+    are treated as not existing (fail open).
+
+    If a known-ID index (id_index.py) is given, IDs it has never seen are
+    definite negatives and are not looked up at all.
+    """
+    unique_ids = list(dict.fromkeys(ids))
+    if index is not None:
+        candidates = [item_id for item_id in unique_ids if index.might_contain(item_id)]
+        metrics.count("dedup", "index_skips", len(unique_ids) - len(candidates))
+        unique_ids = candidates
+    if not unique_ids:
+        return set()
+    with metrics.timed("dedup"):
+        found = _batch_get_ids(table, unique_ids)
+    metrics.count("dedup", "lookups", len(unique_ids))
+    metrics.count("dedup", "existing", len(found))
+    return found
+
+
+def _batch_get_ids(table, unique_ids: list) -> set:
+    found = set()
+    client = table.meta.client
+
+    for chunk in _chunks(unique_ids, BATCH_GET_MAX_KEYS):
+        request = {
+            table.name: {
+                "Keys": [{"id": {"S": item_id}} for item_id in chunk],
+                "ProjectionExpression": "id",
+            }
+        }
+        attempt = 0
+        while request:
+            try:
+                resp = client.batch_get_item(RequestItems=request)
+            except botocore.exceptions.ClientError as e:
+                logger.error(f"BatchGetItem failed on {table.name}: {e}")
+                break
+
+            for item in resp.get("Responses", {}).get(table.name, []):
+                found.add(item["id"]["S"])
+
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+
+            attempt += 1
+            if attempt > MAX_UNPROCESSED_RETRIES:
+                left = len(request.get(table.name, {}).get("Keys", []))
+                logger.warning(f"Giving up on {left} unprocessed keys in {table.name}")
+                break
+            time.sleep(min(2.0, 0.05 * (2 ** attempt)))
+
+    return found
+
+
+# ---------------------------------------------------
+# Buffered lead writer
+# ---------------------------------------------------
+LEAD_SINK_BUFFER_SIZE = int(os.getenv("LEAD_SINK_BUFFER_SIZE", "25"))
+LEAD_SINK_PUT_WORKERS = int(os.getenv("LEAD_SINK_PUT_WORKERS", "8"))
+
+# Flush on every add once the Lambda has less than this much time left
+LEAD_SINK_FLUSH_MARGIN_SECONDS = float(os.getenv("LEAD_SINK_FLUSH_MARGIN_SECONDS", "30"))
+
+
+class LeadSink:
+    """
+    Buffers lead items and writes them to DynamoDB in bulk.
+
+    - conditional=False: flushes through table.batch_writer(), which sends
+      25-item BatchWriteItem requests and resends unprocessed items.
+    - conditional=True: keeps the attribute_not_exists(id) guard and sends
+      the conditional put_item calls in parallel instead.
+
+    The buffer is flushed when it is full, when the Lambda context is close
+    to its timeout, and on close(). Written IDs are added to the known-ID
+    index if one is given.
+    """
+
+    def __init__(
+        self,
+        table,
+        conditional: bool = False,
+        context=None,
+        buffer_size: int = LEAD_SINK_BUFFER_SIZE,
+        label: str = "",
+        index=None,
+    ):
+        self.table = table
+        self.conditional = conditional
+        self.context = context
+        self.buffer_size = max(1, buffer_size)
+        self.label = label or table.name
+        self.index = index
+        self.buffer = []
+        self.saved = 0
+        self.duplicates = 0
+        self.failed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _near_deadline(self) -> bool:
+        if self.context is None or not hasattr(self.context, "get_remaining_time_in_millis"):
+            return False
+        return self.context.get_remaining_time_in_millis() < LEAD_SINK_FLUSH_MARGIN_SECONDS * 1000
+
+    def add(self, item: dict):
+        self.buffer.append(item)
+        if len(self.buffer) >= self.buffer_size or self._near_deadline():
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered; return how many items were saved."""
+        if not self.buffer:
+            return 0
+        items, self.buffer = self.buffer, []
+
+        duplicates, failed = self.duplicates, self.failed
+        with metrics.timed("save"):
+            if self.conditional:
+                saved = self._flush_conditional(items)
+            else:
+                saved = self._flush_batch(items)
+        metrics.count("save", "saved", saved)
+        metrics.count("save", "duplicates", self.duplicates - duplicates)
+        metrics.count("save", "failed", self.failed - failed)
+
+        self.saved += saved
+        return saved
+
+    def close(self) -> int:
+        """Flush and return the total number of items saved by this sink."""
+        self.flush()
+        logger.info(
+            f"[{self.label}] Lead sink closed: saved={self.saved} "
+            f"duplicates={self.duplicates} failed={self.failed}"
+        )
+        return self.saved
+
+    def _flush_batch(self, items: list) -> int:
+        try:
+            with self.table.batch_writer(overwrite_by_pkeys=["id"]) as batch:
+                for item in items:
+                    batch.put_item(Item=item)
+        except botocore.exceptions.ClientError as e:
+            logger.error(f"[{self.label}] Error batch-saving {len(items)} items: {e}")
+            self.failed += len(items)
+            return 0
+        logger.info(f"[{self.label}] Batch-saved {len(items)} items to DynamoDB")
+        self._remember(items)
+        return len(items)
+
+    def _remember(self, items: list):
+        if self.index is None:
+            return
+        for item in items:
+            self.index.add(item["id"])
+
+    def _put_conditional(self, item: dict) -> str:
+        try:
+            self.table.put_item(
+                Item=item,
+                ConditionExpression="attribute_not_exists(id)",
+            )
+            return "saved"
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return "duplicate"
+            logger.error(f"[{self.label}] Error saving item {item.get('id')}: {e}")
+            return "failed"
+
+    def _flush_conditional(self, items: list) -> int:
+        workers = min(LEAD_SINK_PUT_WORKERS, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(self._put_conditional, items))
+
+        # Duplicates are in the table too, so both count as known IDs
+        self._remember([i for i, o in zip(items, outcomes) if o != "failed"])
+        self.duplicates += outcomes.count("duplicate")
+        self.failed += outcomes.count("failed")
+        saved = outcomes.count("saved")
+        logger.info(
+            f"[{self.label}] Conditional puts: {saved} saved, "
+            f"{outcomes.count('duplicate')} duplicates skipped"
+        )
+        return saved
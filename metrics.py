@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# "emf": one CloudWatch Embedded Metric Format line per agent/stage on
+# stdout at the end of each invocation (CloudWatch turns them into metrics)
+# "file": the same documents appended to METRICS_FILE, for local runs
+# "off": record nothing
+METRICS_MODE = os.getenv("METRICS_MODE", "emf")
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "SpeakingAgents")
+METRICS_FILE = os.getenv("METRICS_FILE", "metrics.jsonl")
+
+# Upper bounds (ms) of the latency histogram buckets; slower goes in "+Inf"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_agent = contextvars.ContextVar("metrics_agent", default="")
+
+
+class StageStats:
+    """Calls, errors, bytes, named counters and a latency histogram for one agent/stage."""
+
+    __slots__ = ("calls", "errors", "bytes", "counters", "buckets", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.counters = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float, ok: bool):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th latency, capped at max_ms."""
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n and i < len(LATENCY_BUCKETS_MS):
+                return round(min(float(LATENCY_BUCKETS_MS[i]), self.max_ms), 1)
+        return round(self.max_ms, 1)
+
+    def histogram(self) -> dict:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + ["+Inf"]
+        return {label: n for label, n in zip(labels, self.buckets) if n}
+
+
+_stages = {}
+_lock = threading.Lock()
+
+
+def set_agent(name: str):
+    """Attribute what this context (and threads/tasks started from it) records to `name`."""
+    _agent.set(name)
+
+
+def current_agent() -> str:
+    return _agent.get() or "unknown"
+
+
+def _stats(stage: str, agent: str | None = None) -> StageStats:
+    key = (agent or current_agent(), stage)
+    stats = _stages.get(key)
+    if stats is None:
+        stats = _stages.setdefault(key, StageStats())
+    return stats
+
+
+def observe(stage: str, ms: float, ok: bool = True, agent: str | None = None):
+    if METRICS_MODE == "off":
+        return
+    with _lock:
+        _stats(stage, agent).observe(ms, ok)
+
+
+def count(stage: str, name: str, value: int = 1):
+    if METRICS_MODE == "off" or not value:
+        return
+    with _lock:
+        counters = _stats(stage).counters
+        counters[name] = counters.get(name, 0) + value
+
+
+def add_bytes(stage: str, n: int):
+    if METRICS_MODE == "off" or not n:
+        return
+    with _lock:
+        _stats(stage).bytes += n
+
+
+@contextmanager
+def timed(stage: str):
+    """Time the block as one call of `stage`; an exception counts as an error."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        observe(stage, (time.perf_counter() - started) * 1000, ok)
+
+
+# ---------------------------------------------------
+# Output
+# ---------------------------------------------------
+def _document(agent: str, stage: str, stats: StageStats, timestamp_ms: int) -> dict:
+    values = {
+        "Calls": (stats.calls, "Count"),
+        "Errors": (stats.errors, "Count"),
+        "Bytes": (stats.bytes, "Bytes"),
+    }
+    # Stages with only counters (e.g. all cache hits) have no latency to report
+    if stats.calls:
+        values.update({
+            "LatencyAvg": (round(stats.total_ms / stats.calls, 1), "Milliseconds"),
+            "LatencyP50": (stats.percentile(0.5), "Milliseconds"),
+            "LatencyP90": (stats.percentile(0.9), "Milliseconds"),
+            "LatencyP99": (stats.percentile(0.99), "Milliseconds"),
+            "LatencyMax": (round(stats.max_ms, 1), "Milliseconds"),
+        })
+    for name, value in stats.counters.items():
+        values[name] = (value, "Count")
+
+    doc = {
+        "_aws": {
+            "Timestamp": timestamp_ms,
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Agent", "Stage"]],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in values.items()],
+            }],
+        },
+        "Agent": agent,
+        "Stage": stage,
+        # Not a metric: kept in the log line for Logs Insights
+        "LatencyHistogram": stats.histogram(),
+    }
+    doc.update({name: value for name, (value, _) in values.items()})
+    return doc
+
+
+def flush() -> list:
+    """
+    Emit everything recorded since the last flush (one EMF document per
+    agent/stage) and start over. Returns the documents.
+    """
+    with _lock:
+        stages = dict(_stages)
+        _stages.clear()
+    if METRICS_MODE == "off" or not stages:
+        return []
+
+    now_ms = int(time.time() * 1000)
+    docs = [_document(agent, stage, stats, now_ms) for (agent, stage), stats in sorted(stages.items(), key=lambda kv: kv[0])]
+
+    if METRICS_MODE == "file":
+        try:
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                for doc in docs:
+                    f.write(json.dumps(doc) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {METRICS_FILE}: {e}")
+    else:
+        # EMF must be the whole log line, so print rather than logger
+        for doc in docs:
+            print(json.dumps(doc), flush=True)
+    return docs
+
+
+def handler(fn):
+    """
+    Lambda handler decorator: time the invocation (recorded under the
+    handler's name, since one invocation may run several agents) and
+    flush metrics once at the end.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(event, context):
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = fn(event, context)
+            ok = True
+            return result
+        finally:
+            observe("invocation", (time.perf_counter() - started) * 1000, ok, agent=fn.__name__)
+            flush()
+
+    return wrapper
@@ -0,0 +1,161 @@
+"""
+Re-key stored leads after the switch to canonical URLs (urls.py).
+
+Record IDs used to hash the raw Google link, so tracking parameters,
+fragments, http/https and index.html variants of one page got separate
+records. This recomputes every record's ID from its canonical URL with the
+runner that wrote it, and (with --apply):
+
+- moves a record to its new ID, keeping the old one in `legacy_id`
+- merges the emails of records that share a canonical ID (duplicates)
+  into the one that keeps it, then deletes the duplicates
+- rewrites `url` to the canonical form
+
+Dry run by default. --map-file writes an old_id,new_id,action CSV either way.
+
+    python migrate_ids.py                                   # main leads table
+    python migrate_ids.py --table sga-leads --apply --map-file sga_ids.csv
+"""
+import os
+import csv
+import argparse
+import importlib
+
+import boto3
+
+import urls
+
+# Same table as export_leads.py (backup + truck agents)
+TABLE_NAME = "speaking-leads-v3-multi"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", default=TABLE_NAME)
+    parser.add_argument("--region", default=os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
+    parser.add_argument("--apply", action="store_true", help="write the changes (default: dry run)")
+    parser.add_argument("--map-file", default="", help="CSV of old_id,new_id,action")
+    return parser.parse_args()
+
+
+def load_id_functions(table_name: str) -> dict:
+    """The runners' own ID functions, so IDs match what they will look up."""
+    # sga_lambda_function builds its table from DDB_TABLE_NAME at import
+    os.environ.setdefault("DDB_TABLE_NAME", table_name)
+    truck = importlib.import_module("lambda")
+    backup = importlib.import_module("lambda_backup_DEC06")
+    sga = importlib.import_module("sga_lambda_function")
+    return {
+        "truck": lambda item: truck.generate_id(item["email"], item["url"], item["agent"]),
+        "backup": lambda item: backup.make_id(item["url"], item["source"]),
+        "sga": lambda item: sga.record_id(item["url"], item["source"]),
+    }
+
+
+def record_kind(item: dict) -> str | None:
+    """Which runner wrote the item, from the attributes each one sets."""
+    if "agent" in item and "email" in item:
+        return "truck"
+    if "query" in item and "source" in item:
+        return "sga"
+    if "source" in item:
+        return "backup"
+    return None
+
+
+def scan_items(table) -> list:
+    items = []
+    kwargs = {}
+    while True:
+        response = table.scan(**kwargs)
+        items.extend(response.get("Items", []))
+        start_key = response.get("LastEvaluatedKey")
+        if start_key is None:
+            return items
+        kwargs["ExclusiveStartKey"] = start_key
+
+
+def merge_duplicate(keeper: dict, duplicate: dict) -> dict:
+    """keeper plus the emails only the duplicate has."""
+    merged = dict(keeper)
+    for field in ("contact_email", "email"):
+        if not merged.get(field) and duplicate.get(field):
+            merged[field] = duplicate[field]
+    if duplicate.get("emails"):
+        merged["emails"] = list(dict.fromkeys([*merged.get("emails", []), *duplicate["emails"]]))
+    return merged
+
+
+def plan(items: list, id_functions: dict) -> list:
+    """
+    (action, old_id, new_item) per item that changes: "move" to a new ID,
+    "update" in place (url, merged emails), or "drop" as a duplicate once
+    its emails are merged into the record that keeps the canonical ID.
+    """
+    groups = {}
+    for item in items:
+        kind = record_kind(item)
+        if kind is None or not item.get("url"):
+            continue
+        groups.setdefault(id_functions[kind](item), []).append(item)
+
+    changes = []
+    for new_id, group in groups.items():
+        # The record already at the canonical ID keeps it, else the first one
+        group.sort(key=lambda item: item["id"] != new_id)
+        keeper, duplicates = group[0], group[1:]
+        merged = dict(keeper, url=urls.canonical_url(keeper["url"]))
+        for duplicate in duplicates:
+            merged = merge_duplicate(merged, duplicate)
+
+        if keeper["id"] != new_id:
+            changes.append(("move", keeper["id"], dict(merged, id=new_id, legacy_id=keeper["id"])))
+        elif merged != keeper:
+            changes.append(("update", keeper["id"], merged))
+        changes.extend(("drop", duplicate["id"], None) for duplicate in duplicates)
+    return changes
+
+
+def apply_changes(table, changes: list):
+    with table.batch_writer() as batch:
+        for action, old_id, new_item in changes:
+            if new_item is not None:
+                batch.put_item(Item=new_item)
+            if action in ("move", "drop"):
+                batch.delete_item(Key={"id": old_id})
+
+
+def write_map(filename: str, changes: list):
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["old_id", "new_id", "action"])
+        for action, old_id, new_item in changes:
+            writer.writerow([old_id, new_item["id"] if new_item else "", action])
+
+
+def main():
+    args = parse_args()
+    table = boto3.resource("dynamodb", region_name=args.region).Table(args.table)
+
+    print(f"Scanning DynamoDB table: {args.table} ...")
+    items = scan_items(table)
+    changes = plan(items, load_id_functions(args.table))
+
+    counts = {action: sum(1 for c in changes if c[0] == action) for action in ("move", "drop", "update")}
+    print(f"{len(items)} items: {counts['move']} to re-key, {counts['drop']} duplicates, "
+          f"{counts['update']} in-place updates")
+
+    if args.map_file:
+        write_map(args.map_file, changes)
+        print(f"Wrote ID map to {args.map_file}")
+
+    if not args.apply:
+        print("Dry run; pass --apply to write the changes")
+        return
+
+    apply_changes(table, changes)
+    print(f"Applied {len(changes)} changes")
+
+
+if __name__ == "__main__":
+    main()
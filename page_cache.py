@@ -0,0 +1,165 @@
+import os
+import hashlib
+import logging
+import threading
+from contextlib import closing
+
+import email_extract
+import http_client
+import metrics
+import state_store
+import urls
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Per-URL validators (ETag / Last-Modified / content hash) plus the emails
+# found last time. Set PAGE_REVALIDATE=0 to always download and rescan.
+PAGE_REVALIDATE = os.getenv("PAGE_REVALIDATE", "1") == "1"
+PAGE_CACHE_TTL_SECONDS = int(os.getenv("PAGE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+_stats = {"not_modified": 0, "hash_unchanged": 0, "scanned": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+    metrics.count("fetch", key)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def log_stats(prefix: str = "http"):
+    logger.info(f"[{prefix}] Page revalidation stats: {stats()}")
+
+
+def _key(url: str) -> str:
+    return "page#" + hashlib.sha256(urls.url_key(url).encode("utf-8")).hexdigest()
+
+
+def lookup(url: str, first_match: bool = False) -> dict | None:
+    """
+    Stored entry for `url` that can answer this kind of scan, or None.
+    Entries from a first-match scan only hold the emails before the early
+    stop, so they can't stand in for a full scan.
+    """
+    if not PAGE_REVALIDATE:
+        return None
+    entry = state_store.get_store().get(_key(url))
+    if entry is None or not (entry.get("complete") or first_match):
+        return None
+    return entry
+
+
+def conditional_headers(entry: dict | None) -> dict:
+    """If-None-Match / If-Modified-Since for a stored entry."""
+    headers = {}
+    if entry is None:
+        return headers
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def reuse(url: str, entry: dict) -> list:
+    """Emails from the stored entry after a 304."""
+    _count("not_modified")
+    logger.info(f"Not modified, reusing {len(entry.get('emails', []))} stored emails: {url}")
+    return entry.get("emails", [])
+
+
+class PageScan:
+    """
+    Email scan of one downloaded page that also keeps its validators.
+
+    first_match scans stop early (see email_extract.ChunkScanner). Full
+    scans hash the page text first and only scan it when the hash differs
+    from the stored one (servers without ETag/Last-Modified still save
+    the scan).
+    """
+
+    def __init__(self, url: str, entry: dict | None = None, first_match: bool = False):
+        self.url = url
+        self.entry = entry
+        self.first_match = first_match
+        self.scanner = email_extract.ChunkScanner(first_match=True) if first_match else None
+        self.hasher = hashlib.sha256()
+        self.chunks = []
+
+    @property
+    def done(self) -> bool:
+        return self.scanner is not None and self.scanner.done
+
+    def feed(self, text: str):
+        if self.scanner is not None:
+            self.scanner.feed(text)
+        else:
+            self.hasher.update(text.encode("utf-8", "surrogatepass"))
+            self.chunks.append(text)
+
+    def finish(self) -> list:
+        if self.scanner is not None:
+            _count("scanned")
+            return self.scanner.finish()
+
+        entry = self.entry
+        if entry and entry.get("complete") and entry.get("hash") == self.hasher.hexdigest():
+            _count("hash_unchanged")
+            logger.info(f"Content unchanged, reusing stored emails: {self.url}")
+            return entry.get("emails", [])
+
+        _count("scanned")
+        return email_extract.scan_chunks(self.chunks)
+
+    def save(self, headers, emails: list):
+        """Store the response validators with the emails just found."""
+        if not PAGE_REVALIDATE:
+            return
+        entry = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "emails": emails,
+            "complete": self.scanner is None,
+            "hash": self.hasher.hexdigest() if self.scanner is None else None,
+        }
+        if not (entry["etag"] or entry["last_modified"] or entry["hash"]):
+            return
+        state_store.get_store().put(_key(self.url), entry, ttl=PAGE_CACHE_TTL_SECONDS)
+
+
+def scan_emails(url: str, first_match: bool = False, **kwargs) -> list:
+    """
+    Emails on a page (in page order), revalidating against the stored
+    copy: a 304 or unchanged content reuses the stored emails.
+    HTTP errors are raised.
+    """
+    entry = lookup(url, first_match)
+    headers = dict(kwargs.pop("headers", None) or {}, **conditional_headers(entry))
+
+    with metrics.timed("fetch"):
+        resp = http_client.open_html(url, headers=headers, **kwargs)
+        if resp is None:
+            return []
+        with closing(resp):
+            if resp.status_code == 304:
+                return reuse(url, entry) if entry is not None else []
+
+            scan = PageScan(url, entry, first_match)
+            for text in http_client.iter_text(resp):
+                scan.feed(text)
+                if scan.done:
+                    break
+            emails = scan.finish()
+            scan.save(resp.headers, emails)
+            return emails
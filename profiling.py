@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import uuid
+import logging
+import functools
+import threading
+import contextvars
+import tracemalloc
+
+import boto3
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Profile every invocation (PROFILE=1), or only those whose event has
+# "profile": true / {"top": 40, "output": "s3"}
+PROFILE = os.getenv("PROFILE", "0") == "1"
+
+# Rows in each report: functions by cumulative time, allocation sites by size
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "30"))
+
+# Where the report goes:
+#   "response" -> "profile" key in the response body
+#   "file"     -> <PROFILE_DIR>/<handler>-<time>.json plus a .prof for pstats/snakeviz
+#   "s3"       -> the same two objects under PROFILE_S3_BUCKET/PROFILE_S3_PREFIX
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "response")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+PROFILE_S3_BUCKET = os.getenv("PROFILE_S3_BUCKET", "")
+PROFILE_S3_PREFIX = os.getenv("PROFILE_S3_PREFIX", "profiles/")
+
+# Stack frames kept per allocation; more frames cost more memory while tracing
+PROFILE_TRACE_FRAMES = int(os.getenv("PROFILE_TRACE_FRAMES", "1"))
+
+_session = contextvars.ContextVar("profile_session", default=None)
+
+
+class Session:
+    """
+    cProfile data for one invocation. Before Python 3.12 cProfile only
+    sees the thread that enabled it, so work on the fetch pool is profiled
+    per call (see call()) and merged in at the end.
+    """
+
+    def __init__(self):
+        self.main = cProfile.Profile()
+        self.thread_id = threading.get_ident()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile):
+        with self.lock:
+            self.threads.append(profile)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.main)
+        with self.lock:
+            for profile in self.threads:
+                stats.add(profile)
+        return stats
+
+
+def active() -> bool:
+    return _session.get() is not None
+
+
+def call(fn, *args):
+    """
+    fn(*args), profiled into the current invocation's session if there is
+    one. For pool threads, which run in a copy of the submitter's context.
+    """
+    session = _session.get()
+    if session is None or threading.get_ident() == session.thread_id:
+        return fn(*args)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+: one profiler per process, and it already sees this thread
+        return fn(*args)
+    try:
+        return fn(*args)
+    finally:
+        profile.disable()
+        session.add(profile)
+
+
+# ---------------------------------------------------
+# Reports
+# ---------------------------------------------------
+def _where(filename: str, lineno: int) -> str:
+    # Last two path components are enough to tell modules apart
+    short = "/".join(filename.replace("\\", "/").split("/")[-2:])
+    return f"{short}:{lineno}"
+
+
+def top_functions(stats: pstats.Stats, top: int) -> list:
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:top]
+    return [
+        {
+            "function": f"{_where(filename, lineno)}({name})",
+            "calls": calls,
+            "tottime_s": round(tottime, 4),
+            "cumtime_s": round(cumtime, 4),
+        }
+        for (filename, lineno, name), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, top: int) -> list:
+    rows = snapshot.statistics("traceback" if PROFILE_TRACE_FRAMES > 1 else "lineno")[:top]
+    return [
+        {
+            "site": " <- ".join(_where(frame.filename, frame.lineno) for frame in stat.traceback),
+            "size_kib": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in rows
+    ]
+
+
+def _max_rss_mib() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _options(event) -> dict | None:
+    """Profiling options for this event, or None to run unprofiled."""
+    flag = event.get("profile") if isinstance(event, dict) else None
+    if not flag and not PROFILE:
+        return None
+    options = {"top": PROFILE_TOP_N, "output": PROFILE_OUTPUT}
+    if isinstance(flag, dict):
+        options.update({k: flag[k] for k in ("top", "output") if k in flag})
+    return options
+
+
+# ---------------------------------------------------
+# Output
+# ---------------------------------------------------
+def _write_file(name: str, report: dict, stats: pstats.Stats) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, name)
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    stats.dump_stats(base + ".prof")
+    return base + ".json"
+
+
+def _write_s3(name: str, report: dict, stats: pstats.Stats) -> str:
+    s3 = boto3.client("s3")
+    key = PROFILE_S3_PREFIX + name
+    s3.put_object(Bucket=PROFILE_S3_BUCKET, Key=key + ".json", Body=json.dumps(report).encode("utf-8"))
+    # pstats only dumps to a path; /tmp is the writable part of a Lambda
+    path = f"/tmp/{os.path.basename(name)}.prof"
+    stats.dump_stats(path)
+    with open(path, "rb") as f:
+        s3.put_object(Bucket=PROFILE_S3_BUCKET, Key=key + ".prof", Body=f.read())
+    os.remove(path)
+    return f"s3://{PROFILE_S3_BUCKET}/{key}.json"
+
+
+def _attach(response, report: dict):
+    """Put the report (or where it was written) into the JSON response body."""
+    if not isinstance(response, dict) or "body" not in response:
+        return response
+    try:
+        body = json.loads(response["body"])
+    except (TypeError, ValueError):
+        return response
+    if not isinstance(body, dict):
+        return response
+    body["profile"] = report
+    return dict(response, body=json.dumps(body))
+
+
+def _publish(name: str, response, report: dict, stats: pstats.Stats, output: str):
+    summary = {k: report[k] for k in ("handler", "wall_s", "peak_traced_mib", "max_rss_mib")}
+    try:
+        if output == "file":
+            location = _write_file(name, report, stats)
+        elif output == "s3" and PROFILE_S3_BUCKET:
+            location = _write_s3(name, report, stats)
+        else:
+            if output == "s3":
+                logger.warning("[profile] PROFILE_S3_BUCKET is not set; returning the profile in the response")
+            elif output != "response":
+                logger.warning(f"[profile] Unknown profile output {output!r}; returning the profile in the response")
+            return _attach(response, report)
+    except Exception as e:
+        logger.warning(f"[profile] Could not write profile to {output}: {e}; returning it in the response")
+        return _attach(response, report)
+
+    logger.info(f"[profile] Wrote profile to {location}")
+    return _attach(response, dict(summary, location=location))
+
+
+def handler(fn):
+    """
+    Lambda handler decorator: when the event asks for it (or PROFILE=1),
+    run the handler under cProfile and tracemalloc and report the top
+    functions by cumulative time and the top allocation sites.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(event, context):
+        options = _options(event)
+        if options is None or active():
+            return fn(event, context)
+
+        session = Session()
+        try:
+            session.main.enable()
+        except ValueError:
+            # Python 3.12+ allows one profiler per process (e.g. local fan-out workers)
+            logger.warning(f"[profile] Another profiler is active; running {fn.__name__} unprofiled")
+            return fn(event, context)
+
+        token = _session.set(session)
+        # Another invocation in this process may already be tracing
+        # allocations; share it rather than stopping it early
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(PROFILE_TRACE_FRAMES)
+        started = time.perf_counter()
+        try:
+            response = fn(event, context)
+        finally:
+            session.main.disable()
+            wall = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            _session.reset(token)
+
+        stats = session.stats()
+        top = int(options["top"])
+        report = {
+            "handler": fn.__name__,
+            "wall_s": round(wall, 3),
+            "peak_traced_mib": round(peak / 1024 / 1024, 1),
+            "max_rss_mib": _max_rss_mib(),
+            "top_cumulative": top_functions(stats, top),
+            "top_allocations": top_allocations(snapshot, top),
+        }
+        logger.info(
+            f"[profile] {fn.__name__}: {report['wall_s']}s, peak traced "
+            f"{report['peak_traced_mib']} MiB, max RSS {report['max_rss_mib']} MiB"
+        )
+        name = f"{fn.__name__}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}"
+        # Local runs (e.g. fan-out workers) have no request ID to keep names apart
+        name += "-" + (getattr(context, "aws_request_id", None) or uuid.uuid4().hex[:8])
+        return _publish(name, response, report, stats, options["output"])
+
+    return wrapper
@@ -0,0 +1,140 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+import domains
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Default politeness for any website: sustained requests/sec and burst size
+HOST_RATE_PER_SECOND = float(os.getenv("HOST_RATE_PER_SECOND", "1.0"))
+HOST_BURST = float(os.getenv("HOST_BURST", "2"))
+
+# Upstream APIs with their own limits (host -> (rate, burst))
+UPSTREAM_LIMITS = {
+    "googleapis.com": (
+        float(os.getenv("CSE_RATE_PER_SECOND", "1.5")),
+        float(os.getenv("CSE_BURST", "3")),
+    ),
+}
+
+# Never honour a Retry-After longer than this (Lambda has 900s total)
+MAX_RETRY_AFTER_SECONDS = float(os.getenv("MAX_RETRY_AFTER_SECONDS", "60"))
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, at most `capacity`
+    stored. acquire() blocks only when the bucket is empty, so requests to
+    a quiet host are never delayed.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        Take one token now (going into debt if needed) and return how many
+        seconds the caller must wait before sending. Works for both
+        threads (time.sleep) and coroutines (asyncio.sleep).
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self) -> float:
+        """Take one token, sleeping as needed; returns the seconds waited."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def pause(self, seconds: float):
+        """Hold all requests for `seconds` (e.g. from a Retry-After header)."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def host_key(url: str) -> str:
+    return domains.host_key(url)
+
+
+def bucket_for(url: str) -> TokenBucket:
+    key = host_key(url)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            rate, burst = UPSTREAM_LIMITS.get(key, (HOST_RATE_PER_SECOND, HOST_BURST))
+            bucket = TokenBucket(rate, burst)
+            _buckets[key] = bucket
+        return bucket
+
+
+def wait_turn(url: str):
+    """Block until a request to this URL's host is allowed."""
+    waited = bucket_for(url).acquire()
+    if waited >= 1:
+        logger.info(f"Rate limited {host_key(url)}: waited {waited:.1f}s")
+
+
+async def wait_turn_async(url: str):
+    """asyncio version of wait_turn."""
+    delay = bucket_for(url).reserve()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After as seconds; accepts delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def note_response(url: str, status_code: int, headers) -> float | None:
+    """
+    Back off a host that answered 429/503, for its Retry-After capped at
+    MAX_RETRY_AFTER_SECONDS. Returns the delay the host asked for
+    (uncapped), or None when the response wasn't throttled.
+    """
+    if status_code not in (429, 503):
+        return None
+    requested = parse_retry_after(headers.get("Retry-After"))
+    if requested is None:
+        requested = 1.0 / bucket_for(url).rate
+    seconds = min(requested, MAX_RETRY_AFTER_SECONDS)
+    logger.warning(f"{host_key(url)} returned {status_code}; pausing it for {seconds:.1f}s")
+    bucket_for(url).pause(seconds)
+    return requested
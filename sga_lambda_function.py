@@ -1,12 +1,25 @@
 import os
 import json
+import math
+import asyncio
 import uuid
-import re
 import logging
 from datetime import datetime, timezone
 
 import boto3
-import requests
+
+import async_pipeline
+import email_score
+import fetch_pool
+import google_cse
+import http_client
+import id_index
+import lead_store
+import metrics
+import page_cache
+import profiling
+import state_store
+import urls
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -23,132 +36,191 @@ AGENT_SOURCE = os.getenv("AGENT_SOURCE", "sga-agent")
 DEFAULT_QUERY = "Student Government Association leadership retreat site:.edu"
 SEARCH_QUERIES = os.getenv("SEARCH_QUERIES", DEFAULT_QUERY).split("||")
 
-# Limit how many search results per run
+# Limit how many search results per query (CSE pages of 10 are fetched as needed)
 MAX_RESULTS = int(os.getenv("MAX_RESULTS", "10"))
+MAX_PAGES = math.ceil(MAX_RESULTS / 10)
 
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(DDB_TABLE_NAME)
 
 
-def google_search(query: str) -> list:
-    """Call Google Programmable Search (CSE) for a query."""
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {
-        "key": GOOGLE_API_KEY,
-        "cx": GOOGLE_CX,
-        "q": query,
-    }
+def google_search(query: str):
+    """
+    Yield up to MAX_RESULTS Google Programmable Search (CSE) results for a
+    query, paging lazily and stopping once a page holds only stored URLs.
+    """
     logger.info(f"[google_search] Querying Google CSE: {query}")
-    resp = requests.get(url, params=params, timeout=15)
-    resp.raise_for_status()
-    data = resp.json()
-    return data.get("items", [])
+    # Cached, quota-counted calls (see google_cse.py)
+    results = google_cse.iter_results(query, pages=MAX_PAGES, known_links=known_links)
+    for count, item in enumerate(results):
+        if count >= MAX_RESULTS:
+            return
+        yield item
+
+
+def record_id(url: str, source: str = AGENT_SOURCE) -> str:
+    # Deterministic ID based on source + canonical URL (urls.url_key)
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{urls.url_key(url)}").hex
+
+
+def known_links(links: list) -> set:
+    """The links that already have a record in the table."""
+    ids = {record_id(link): link for link in links}
+    existing = lead_store.batch_existing_ids(table, list(ids), index=id_index.get_index(table))
+    return {ids[item_id] for item_id in existing}
 
 
 def fetch_emails_from_url(url: str) -> list:
     """Fetch a page and extract emails using regex."""
     logger.info(f"[fetch_emails_from_url] Fetching {url}")
     try:
-        resp = requests.get(url, timeout=15)
-        resp.raise_for_status()
-        html = resp.text
+        # Streamed and scanned chunk by chunk, capped at FETCH_MAX_BYTES
+        # Revalidated against the last crawl (see page_cache.py)
+        emails = page_cache.scan_emails(url, timeout=15)
     except Exception as e:
         logger.warning(f"[fetch_emails_from_url] Error fetching {url}: {e}")
         return []
 
-    # Basic email regex
-    email_pattern = r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
-    emails = re.findall(email_pattern, html)
-    unique_emails = sorted(set(emails))
+    # Already unique and ranked best first (mailto: links lead)
     logger.info(
-        f"[fetch_emails_from_url] Found {len(unique_emails)} emails on {url}"
+        f"[fetch_emails_from_url] Found {len(emails)} emails on {url}"
     )
-    return unique_emails
+    return emails
 
 
-def choose_primary_email(url: str, emails: list) -> str | None:
-    """Prefer .edu email matching the site's domain; else first .edu; else first."""
-    if not emails:
-        return None
+def save_item_to_dynamodb(sink, item: dict):
+    logger.info(f"[{AGENT_SOURCE}] Saving item to DynamoDB: {item}")
+    sink.add(item)
+
+
+def build_item(query: str, result: dict, emails: list, now_iso: str) -> dict:
+    """emails ranked best first (see email_score.py); the first is the primary."""
+    url = result.get("link")
+    primary_email = emails[0] if emails else None
+
+    ddb_item = {
+        "id": record_id(url),
+        "url": url,
+        "title": result.get("title", ""),
+        "snippet": result.get("snippet", ""),
+        "source": AGENT_SOURCE,
+        "query": query,
+        "timestamp": now_iso,
+    }
 
-    # Get domain from URL
-    domain_match = re.search(r"https?://([^/]+)/?", url)
-    page_domain = domain_match.group(1).lower() if domain_match else ""
+    if primary_email:
+        ddb_item["email"] = primary_email
+    if emails:
+        ddb_item["emails"] = emails
+    return ddb_item
 
-    # 1) .edu and contains domain
-    for e in emails:
-        lower = e.lower()
-        if lower.endswith(".edu") and page_domain and page_domain.split(":")[0] in lower:
-            return e
 
-    # 2) any .edu email
-    for e in emails:
-        if e.lower().endswith(".edu"):
-            return e
+def save_scored(sink, scorer, query: str, fetched: list, now_iso: str):
+    """Save (result, emails) pairs, ranking each page's emails with the run's scorer."""
+    for result, emails in fetched:
+        scorer.observe(result["link"], emails)
+    for result, emails in fetched:
+        ranked = scorer.rank(result["link"], emails)
+        save_item_to_dynamodb(sink, build_item(query, result, ranked, now_iso))
 
-    # 3) fallback: first email
-    return emails[0]
 
+def finish_run(sink) -> int:
+    saved_count = sink.close()
+    http_client.log_connection_stats(AGENT_SOURCE)
+    page_cache.log_stats(AGENT_SOURCE)
+    logger.info(f"[{AGENT_SOURCE}] Google CSE stats: {google_cse.run_stats()}")
+    state_store.flush()
+    return saved_count
 
-def save_item_to_dynamodb(item: dict):
-    logger.info(f"[{AGENT_SOURCE}] Saving item to DynamoDB: {item}")
-    table.put_item(Item=item)
 
+def run_agent(context=None) -> int:
+    metrics.set_agent(AGENT_SOURCE)
+    # ASYNC_PIPELINE=1 (with httpx installed) switches to the asyncio runner
+    if async_pipeline.enabled():
+        return asyncio.run(run_agent_async(context))
 
-def run_agent() -> int:
-    saved_count = 0
+    sink = lead_store.LeadSink(table, context=context, label=AGENT_SOURCE)
+    scorer = email_score.BatchScorer()
     now_iso = datetime.now(timezone.utc).isoformat()
+    google_cse.start_run()
 
     for query in SEARCH_QUERIES:
         query = query.strip()
         if not query:
             continue
 
-        items = google_search(query)
-        if not items:
-            continue
-
-        for result in items[:MAX_RESULTS]:
-            url = result.get("link")
-            title = result.get("title", "")
-            snippet = result.get("snippet", "")
-
-            if not url:
-                continue
-
-            emails = fetch_emails_from_url(url)
-            primary_email = choose_primary_email(url, emails)
+        fetched = []
+        out_of_quota = False
+        try:
+            for result in google_search(query):
+                url = result.get("link")
+                if not url:
+                    continue
 
-            # Deterministic ID based on source + URL
-            record_id = uuid.uuid5(
-                uuid.NAMESPACE_URL, f"{AGENT_SOURCE}:{url}"
-            ).hex
+                fetched.append((result, fetch_emails_from_url(url)))
+        except google_cse.QuotaExceeded as e:
+            logger.warning(f"[{AGENT_SOURCE}] Stopping searches early: {e}")
+            out_of_quota = True
 
-            ddb_item = {
-                "id": record_id,
-                "url": url,
-                "title": title,
-                "snippet": snippet,
-                "source": AGENT_SOURCE,
-                "query": query,
-                "timestamp": now_iso,
-            }
+        # Scored per query batch; the scorer remembers earlier batches
+        save_scored(sink, scorer, query, fetched, now_iso)
+        if out_of_quota:
+            break
 
-            if primary_email:
-                ddb_item["email"] = primary_email
-            if emails:
-                ddb_item["emails"] = emails
-
-            save_item_to_dynamodb(ddb_item)
-            saved_count += 1
-
-    return saved_count
+    return finish_run(sink)
 
 
+async def run_agent_async(context=None) -> int:
+    """asyncio version of run_agent (see async_pipeline.py)."""
+    metrics.set_agent(AGENT_SOURCE)
+    deadline = fetch_pool.make_deadline()
+    now_iso = datetime.now(timezone.utc).isoformat()
+    google_cse.start_run()
+    sink = lead_store.LeadSink(table, context=context, label=AGENT_SOURCE)
+    queries = [q.strip() for q in SEARCH_QUERIES if q.strip()]
+
+    async with async_pipeline.AsyncFetcher() as fetcher:
+        searches = await asyncio.gather(
+            *(fetcher.search_pages(query, pages=MAX_PAGES, known_links=known_links) for query in queries),
+            return_exceptions=True,
+        )
+
+        results = []
+        for query, items in zip(queries, searches):
+            if isinstance(items, google_cse.QuotaExceeded):
+                logger.warning(f"[{AGENT_SOURCE}] Search skipped, {items}: {query}")
+                continue
+            if isinstance(items, Exception):
+                raise items
+            results.extend((query, r) for r in items[:MAX_RESULTS] if r.get("link"))
+
+        page_emails = await async_pipeline.gather_until(
+            {r["link"]: fetcher.all_emails(r["link"]) for _, r in results},
+            deadline,
+        )
+
+    def save_all():
+        # Every page is in already, so the scorer sees the whole run first
+        scorer = email_score.BatchScorer()
+        for _, result in results:
+            scorer.observe(result["link"], page_emails.get(result["link"], []))
+        for query in queries:
+            fetched = [
+                (result, page_emails[result["link"]]) for q, result in results
+                if q == query and result["link"] in page_emails
+            ]
+            save_scored(sink, scorer, query, fetched, now_iso)
+        return finish_run(sink)
+
+    return await asyncio.to_thread(save_all)
+
+
+@metrics.handler
+@profiling.handler
 def lambda_handler(event, context):
     logger.info(f"[lambda_handler] Starting agent: {AGENT_SOURCE}")
     try:
-        saved = run_agent()
+        saved = run_agent(context)
         body = {
             "message": f"{AGENT_SOURCE} ran successfully. Saved {saved} items.",
             "saved": saved,
@@ -0,0 +1,234 @@
+import os
+import json
+import atexit
+import time
+import logging
+import threading
+
+import boto3
+import botocore.exceptions
+
+# ---------------------------------------------------
+# Logging setup
+# ---------------------------------------------------
+logger = logging.getLogger()
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Small key/value store for caches, counters and cursors.
+# Uses the DynamoDB table from dynamo.tf when STATE_TABLE_NAME is set,
+# otherwise a JSON file (on Lambda that lives in /tmp for the container).
+# Anything one invocation hands to another (checkpoint cursors, fan-out
+# results) needs the table; see is_shared().
+STATE_TABLE_NAME = os.getenv("STATE_TABLE_NAME", "")
+STATE_BACKEND = os.getenv("STATE_BACKEND", "dynamodb" if STATE_TABLE_NAME else "file")
+STATE_FILE = os.getenv("STATE_FILE", "/tmp/speaking_agent_state.json")
+
+# The file backend rewrites the whole file, so changes are written at most
+# this often, plus by flush() at the end of a run and at exit
+STATE_FILE_FLUSH_SECONDS = float(os.getenv("STATE_FILE_FLUSH_SECONDS", "5"))
+
+
+class DynamoStateStore:
+    """
+    Items look like {"pk": key, "data": "<json>", "expires_at": epoch}.
+    expires_at is also the table's TTL attribute, but expired items are
+    filtered on read because DynamoDB deletes them lazily.
+    """
+
+    def __init__(self, table_name: str):
+        self.table = boto3.resource("dynamodb").Table(table_name)
+
+    def get(self, key: str) -> dict | None:
+        try:
+            resp = self.table.get_item(Key={"pk": key})
+        except botocore.exceptions.ClientError as e:
+            logger.warning(f"State get failed for {key}: {e}")
+            return None
+        item = resp.get("Item")
+        if not item:
+            return None
+        if int(item.get("expires_at", 0)) and int(item["expires_at"]) <= time.time():
+            return None
+        return json.loads(item.get("data", "null"))
+
+    def put(self, key: str, value: dict, ttl: int | None = None):
+        item = {"pk": key, "data": json.dumps(value)}
+        if ttl:
+            item["expires_at"] = int(time.time()) + int(ttl)
+        try:
+            self.table.put_item(Item=item)
+        except botocore.exceptions.ClientError as e:
+            logger.warning(f"State put failed for {key}: {e}")
+
+    def delete(self, key: str):
+        try:
+            self.table.delete_item(Key={"pk": key})
+        except botocore.exceptions.ClientError as e:
+            logger.warning(f"State delete failed for {key}: {e}")
+
+    def incr(self, key: str, amount: int = 1, ttl: int | None = None) -> int:
+        """Atomically add `amount` to a counter and return the new value."""
+        expr = "ADD #c :n"
+        values = {":n": amount}
+        if ttl:
+            expr += " SET expires_at = if_not_exists(expires_at, :exp)"
+            values[":exp"] = int(time.time()) + int(ttl)
+        try:
+            resp = self.table.update_item(
+                Key={"pk": key},
+                UpdateExpression=expr,
+                ExpressionAttributeNames={"#c": "count"},
+                ExpressionAttributeValues=values,
+                ReturnValues="UPDATED_NEW",
+            )
+        except botocore.exceptions.ClientError as e:
+            # Fail open: a broken counter should not stop the run
+            logger.warning(f"State incr failed for {key}: {e}")
+            return 0
+        return int(resp["Attributes"]["count"])
+
+    def get_count(self, key: str) -> int:
+        try:
+            resp = self.table.get_item(
+                Key={"pk": key},
+                ProjectionExpression="#c",
+                ExpressionAttributeNames={"#c": "count"},
+            )
+        except botocore.exceptions.ClientError as e:
+            logger.warning(f"State count read failed for {key}: {e}")
+            return 0
+        return int(resp.get("Item", {}).get("count", 0))
+
+    def flush(self):
+        """Nothing buffered: every call above is its own request."""
+
+
+class FileStateStore:
+    """
+    Same interface as DynamoStateStore, backed by one JSON file. Reads and
+    writes go to memory; the file is rewritten at most every
+    STATE_FILE_FLUSH_SECONDS and on flush().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = self._load()
+        self.dirty = False
+        self.saved_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read state file {self.path}: {e}")
+            return {}
+        # Expired entries are dropped here so the file doesn't keep growing
+        now = time.time()
+        return {
+            key: entry for key, entry in data.items()
+            if not (entry.get("expires_at") and entry["expires_at"] <= now)
+        }
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write state file {self.path}: {e}")
+            return
+        self.dirty = False
+        self.saved_at = time.monotonic()
+
+    def _changed(self):
+        self.dirty = True
+        if time.monotonic() - self.saved_at >= STATE_FILE_FLUSH_SECONDS:
+            self._save()
+
+    def flush(self):
+        """Write pending changes to the file."""
+        with self.lock:
+            if self.dirty:
+                self._save()
+
+    def _live(self, key: str) -> dict | None:
+        entry = self.data.get(key)
+        if not entry:
+            return None
+        if entry.get("expires_at") and entry["expires_at"] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> dict | None:
+        with self.lock:
+            entry = self._live(key)
+            return entry["data"] if entry and "data" in entry else None
+
+    def put(self, key: str, value: dict, ttl: int | None = None):
+        with self.lock:
+            entry = {"data": value}
+            if ttl:
+                entry["expires_at"] = int(time.time()) + int(ttl)
+            self.data[key] = entry
+            self._changed()
+
+    def delete(self, key: str):
+        with self.lock:
+            if self.data.pop(key, None) is not None:
+                self._changed()
+
+    def incr(self, key: str, amount: int = 1, ttl: int | None = None) -> int:
+        with self.lock:
+            entry = self._live(key) or {}
+            entry["count"] = entry.get("count", 0) + amount
+            if ttl and "expires_at" not in entry:
+                entry["expires_at"] = int(time.time()) + int(ttl)
+            self.data[key] = entry
+            self._changed()
+            return entry["count"]
+
+    def get_count(self, key: str) -> int:
+        with self.lock:
+            entry = self._live(key)
+            return entry.get("count", 0) if entry else 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the configured state store (one per container)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if STATE_BACKEND == "dynamodb":
+                _store = DynamoStateStore(STATE_TABLE_NAME)
+            else:
+                _store = FileStateStore(STATE_FILE)
+        return _store
+
+
+def is_shared() -> bool:
+    """
+    True when every invocation sees the same state. The file backend is
+    per container, and another invocation usually runs in another one.
+    """
+    return STATE_BACKEND == "dynamodb"
+
+
+def flush():
+    """Write out anything the store still buffers (end of a run)."""
+    with _store_lock:
+        store = _store
+    if store is not None:
+        store.flush()
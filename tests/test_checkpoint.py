@@ -0,0 +1,92 @@
+"""
+Resuming an agent run from a checkpoint cursor, with Google, DynamoDB and
+the result pages stubbed out.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read at import by the modules below
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ["METRICS_MODE"] = "off"
+os.environ["STATE_BACKEND"] = "file"
+os.environ.pop("ASYNC_PIPELINE", None)
+
+import pytest  # noqa: E402
+
+backup = pytest.importorskip("lambda_backup_DEC06")
+
+import checkpoint  # noqa: E402
+import google_cse  # noqa: E402
+import id_index  # noqa: E402
+import lead_store  # noqa: E402
+
+AGENT = "resume_test_agent"
+
+
+def link(position: int) -> str:
+    return f"https://site{position}.edu/speakers/"
+
+
+@pytest.fixture
+def agent_run(monkeypatch):
+    """
+    One query with two full pages of results; the first page's leads are
+    already stored, as after an invocation that timed out on page 2.
+    Returns (search starts requested, positions saved).
+    """
+    starts, saved = [], []
+
+    def search(query, start=1, num=10):
+        starts.append(start)
+        if start > 11:
+            return []
+        return [{"link": link(start + i), "title": "Speakers"} for i in range(num)]
+
+    stored = {backup.make_id(link(p), AGENT) for p in range(1, 11)}
+
+    def save_candidates(agent_name, candidates, emails, context=None, index=None):
+        saved.extend(position for _, url, _, position in candidates if emails.get(url))
+        return len(saved)
+
+    monkeypatch.setitem(backup.AGENTS, AGENT, {"search_queries": ["speakers"], "max_results_per_query": 20})
+    monkeypatch.setattr(google_cse, "search", search)
+    monkeypatch.setattr(id_index, "get_index", lambda table: None)
+    monkeypatch.setattr(lead_store, "batch_existing_ids", lambda table, ids, index=None: set(ids) & stored)
+    monkeypatch.setattr(backup, "find_contact_email", lambda url, agent_name="": ["events@school.edu"])
+    monkeypatch.setattr(backup, "save_candidates", save_candidates)
+    return starts, saved
+
+
+def test_fresh_run_stops_after_a_page_of_stored_links(agent_run):
+    starts, saved = agent_run
+
+    backup.run_agent(AGENT)
+
+    assert starts == [1]
+    assert saved == []
+
+
+def test_resume_from_a_page_two_cursor_fetches_page_two(agent_run):
+    starts, saved = agent_run
+    cursor = {"agent": AGENT, "query_index": 0, "result_index": 12}
+
+    body = backup.run_agent(AGENT, cursor=cursor)
+
+    assert starts == [1, 11]
+    assert saved == [(0, i) for i in range(12, 20)]
+    assert body["saved"] == 8
+    assert "resume_from" not in body
+
+
+def test_no_reinvoke_when_the_cursor_is_in_a_container_file(monkeypatch):
+    def client(service):
+        raise AssertionError("invoked another function")
+
+    monkeypatch.setattr(checkpoint.boto3, "client", client)
+    context = type("Context", (), {"invoked_function_arn": "arn", "function_name": "agents"})()
+
+    assert checkpoint.reinvoke(context, {"agents": "all"}) is False
@@ -0,0 +1,137 @@
+"""
+Fan-out coordinator with a stub invoker: no agents, DynamoDB or Lambda.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read at import by the modules below
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ["METRICS_MODE"] = "off"
+os.environ["STATE_BACKEND"] = "file"
+
+import json  # noqa: E402
+
+import botocore.exceptions  # noqa: E402
+import pytest  # noqa: E402
+
+import fanout  # noqa: E402
+import state_store  # noqa: E402
+
+
+class StubInvoker:
+    """Records payloads; runs `handler` on the ones it is given, like a worker would."""
+
+    def __init__(self, handler=None, fail_shards=()):
+        self.handler = handler
+        self.fail_shards = set(fail_shards)
+        self.payloads = []
+        self.closed = False
+
+    def invoke(self, payload):
+        if payload["shard"]["id"] in self.fail_shards:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "TooManyRequestsException", "Message": "Rate exceeded"}}, "Invoke"
+            )
+        self.payloads.append(payload)
+        if self.handler is not None:
+            self.handler(payload, None)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def file_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(state_store, "_store", state_store.FileStateStore(str(tmp_path / "state.json")))
+    monkeypatch.setattr(fanout, "FANOUT_POLL_SECONDS", 0.01)
+
+
+def finish_shard(payload, context):
+    shard = payload["shard"]
+    fanout.put_result(payload["run_id"], shard["id"], {"source": shard["agent"], "saved": len(shard["query_indexes"])})
+
+
+def test_make_shards_splits_queries_per_agent():
+    shards = fanout.make_shards({"a": 5, "b": 2, "c": 0}, per_shard=2)
+
+    assert [s["id"] for s in shards] == ["a:0", "a:2", "a:4", "b:0"]
+    assert [s["query_indexes"] for s in shards] == [[0, 1], [2, 3], [4], [0, 1]]
+    assert {s["agent"] for s in shards} == {"a", "b"}
+
+
+def test_start_invokes_one_worker_per_shard():
+    shards = fanout.make_shards({"a": 3}, per_shard=2)
+    invoker = StubInvoker()
+
+    run_id = fanout.start(invoker, shards, payload={"profile": True})
+
+    assert [p["shard"] for p in invoker.payloads] == shards
+    assert all(p["mode"] == "worker" and p["run_id"] == run_id and p["profile"] for p in invoker.payloads)
+    assert fanout.load_shards(run_id) == shards
+
+
+def test_collect_summarizes_finished_and_pending_shards():
+    shards = fanout.make_shards({"a": 4, "b": 1}, per_shard=2)
+    run_id = fanout.start(StubInvoker(), shards)
+    finish_shard({"run_id": run_id, "shard": shards[0]}, None)
+    fanout.put_result(run_id, shards[2]["id"], {"source": "b", "saved": 0, "resume_from": {"query_index": 0}})
+
+    summary = fanout.collect(run_id, shards, wait_seconds=0.05)
+
+    assert summary["done"] == 2
+    assert summary["saved"] == 2
+    assert summary["pending"] == [shards[1]["id"]]
+    assert summary["incomplete"] == [shards[2]["id"]]
+    assert summary["failed"] == []
+
+
+def test_failed_invoke_is_recorded_as_a_failed_shard():
+    shards = fanout.make_shards({"a": 4}, per_shard=2)
+    invoker = StubInvoker(handler=finish_shard, fail_shards={"a:2"})
+
+    run_id = fanout.start(invoker, shards)
+    summary = fanout.collect(run_id, shards)
+
+    assert summary["done"] == 2
+    assert summary["failed"] == ["a:2"]
+    assert summary["saved"] == 2
+
+
+def test_lambda_workers_need_the_shared_state_table(monkeypatch):
+    monkeypatch.setattr(fanout, "FANOUT_INVOKER", "lambda")
+    context = type("Context", (), {"invoked_function_arn": "arn:aws:lambda:us-east-1:1:function:agents"})()
+
+    with pytest.raises(RuntimeError, match="STATE_TABLE_NAME"):
+        fanout.get_invoker(context, finish_shard)
+
+    monkeypatch.setattr(state_store, "STATE_BACKEND", "dynamodb")
+    monkeypatch.setattr(fanout.boto3, "client", lambda service: None)
+    assert isinstance(fanout.get_invoker(context, finish_shard), fanout.LambdaInvoker)
+
+
+def test_worker_events_sent_to_the_coordinator_run_their_shard(monkeypatch):
+    backup = pytest.importorskip("lambda_backup_DEC06")
+    ran = []
+
+    def fake_run_agent(agent_name, context=None, query_indexes=None, **kwargs):
+        ran.append((agent_name, query_indexes))
+        return {"source": agent_name, "saved": 1}
+
+    monkeypatch.setattr(backup, "run_agent", fake_run_agent)
+    agent_name = next(iter(backup.AGENTS))
+    shards = fanout.make_shards({agent_name: len(backup.AGENTS[agent_name]["search_queries"])})
+    # Shards invoked on the coordinator's own function (no FANOUT_WORKER_FUNCTION)
+    invoker = StubInvoker(handler=backup.coordinator_handler)
+    monkeypatch.setattr(fanout, "get_invoker", lambda context, worker_handler: invoker)
+
+    response = backup.coordinator_handler({"mode": "coordinator", "agent": agent_name}, None)
+    body = json.loads(response["body"])
+
+    assert invoker.closed
+    assert ran == [(agent_name, s["query_indexes"]) for s in shards]
+    assert body["pending"] == []
+    assert body["saved"] == len(shards)
@@ -0,0 +1,78 @@
+"""
+429 handling in http_client.get against a local server.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read at import by the modules below
+os.environ["METRICS_MODE"] = "off"
+
+import pytest  # noqa: E402
+
+import http_client  # noqa: E402
+import rate_limit  # noqa: E402
+
+
+@pytest.fixture
+def throttled_server(monkeypatch):
+    """
+    Serves 429 with the Retry-After in server.retry_after for the first
+    server.throttled requests, then 200. Yields the server; its URL is
+    server.url and server.hits counts requests.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            server.hits += 1
+            if server.hits <= server.throttled:
+                self.send_response(429)
+                self.send_header("Retry-After", server.retry_after)
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.hits, server.throttled, server.retry_after = 0, 0, "0"
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(rate_limit, "_buckets", {})
+    monkeypatch.setattr(rate_limit, "HOST_RATE_PER_SECOND", 100.0)
+    monkeypatch.setattr(http_client, "HTTP_RETRIES", 2)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_throttled_request_is_retried_after_the_pause(throttled_server):
+    throttled_server.throttled, throttled_server.retry_after = 2, "0"
+
+    resp = http_client.get(throttled_server.url)
+
+    assert resp.status_code == 200
+    assert throttled_server.hits == 3
+
+
+def test_retry_after_beyond_the_cap_is_not_slept_out(throttled_server, monkeypatch):
+    monkeypatch.setattr(rate_limit, "MAX_RETRY_AFTER_SECONDS", 1.0)
+    throttled_server.throttled, throttled_server.retry_after = 5, "3"
+
+    started = time.monotonic()
+    resp = http_client.get(throttled_server.url)
+
+    assert resp.status_code == 429
+    assert throttled_server.hits == 1
+    assert time.monotonic() - started < 1.0
+    # The host itself stays paused for the capped time
+    assert rate_limit.bucket_for(throttled_server.url).reserve() == pytest.approx(1.0, abs=0.2)
@@ -0,0 +1,139 @@
+import os
+import re
+from functools import lru_cache
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+# ---------------------------------------------------
+# Configuration
+# ---------------------------------------------------
+# Distinct URLs remembered by canonical_url / url_key
+URL_CACHE_SIZE = int(os.getenv("URL_CACHE_SIZE", "16384"))
+
+# ---------------------------------------------------
+# Rules
+# ---------------------------------------------------
+# Query parameters that only track the visit; the page is the same without them
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "_hsenc", "_hsmi", "__hstc", "__hssc", "__hsfp", "mkt_tok",
+    "ref_src", "sessionid", "phpsessid", "jsessionid", "cfid", "cftoken",
+}
+TRACKING_PREFIXES = ("utm_", "hsa_", "pk_", "mtm_")
+
+# Directory index files: ".../men-of-color/index.html" names the same page as
+# ".../men-of-color/" on most servers, so url_key folds them (fetches keep them)
+INDEX_PAGES = {
+    "index.html", "index.htm", "index.shtml", "index.php", "index.asp", "index.aspx",
+    "index.cfm", "default.htm", "default.html", "default.asp", "default.aspx",
+}
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_UNRESERVED = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_SESSION_PATH_PARAM = re.compile(r";(?:jsessionid|phpsessid|sid)=[^/]*", re.IGNORECASE)
+
+
+def _escape(m: re.Match) -> str:
+    char = chr(int(m.group(1), 16))
+    return char if char in _UNRESERVED else "%" + m.group(1).upper()
+
+
+def _path(path: str, fold_index: bool = False) -> str:
+    """Dot segments resolved, "//" collapsed, escapes normalized; index file dropped if fold_index."""
+    path = _ESCAPE.sub(_escape, _SESSION_PATH_PARAM.sub("", path))
+    segments = []
+    for segment in path.split("/"):
+        if segment in ("", "."):
+            continue
+        if segment == "..":
+            if segments:
+                segments.pop()
+            continue
+        segments.append(segment)
+
+    directory = path.endswith("/") or path.endswith("/.") or path.endswith("/..")
+    if fold_index and segments and segments[-1].lower() in INDEX_PAGES:
+        segments.pop()
+        directory = True
+    if not segments:
+        return "/"
+    return "/" + "/".join(segments) + ("/" if directory else "")
+
+
+def _name(param: str) -> str:
+    return unquote_plus(param.split("=", 1)[0])
+
+
+def _query(query: str, sort: bool = False) -> str:
+    """
+    Tracking parameters removed; the rest keep their encoding and order,
+    or with sort are ordered by name only, so repeated names (a=2&a=1)
+    keep their relative order.
+    """
+    if not query:
+        return ""
+    params = [
+        param for param in query.split("&")
+        if param
+        and _name(param).lower() not in TRACKING_PARAMS
+        and not _name(param).lower().startswith(TRACKING_PREFIXES)
+    ]
+    if sort:
+        params.sort(key=_name)
+    return "&".join(params)
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def canonical_url(url: str) -> str:
+    """
+    The form of a URL the agents fetch and store: lower-case scheme and
+    host, no default port, credentials, fragment or tracking parameters,
+    normalized path. Only changes that fetch the same resource: scheme,
+    "www.", index files, query order and a trailing slash are kept;
+    url_key() folds those. Non-http(s) URLs only lose whitespace.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.rstrip(".")
+    # hostname drops the brackets around an IPv6 address
+    netloc = f"[{host}]" if ":" in host else host
+    if port is not None and port != _DEFAULT_PORTS[scheme]:
+        netloc += f":{port}"
+    return urlunsplit((scheme, netloc, _path(parts.path), _query(parts.query), ""))
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def url_key(url: str) -> str:
+    """
+    Identity of a page for IDs and caches: canonical_url() without the
+    scheme, a leading "www.", an index file or a trailing slash, and with
+    the query sorted by name, so http/https, www/bare and index.html
+    variants of one page share a key.
+    """
+    canonical = canonical_url(url)
+    try:
+        parts = urlsplit(canonical)
+    except ValueError:
+        return canonical
+    if parts.scheme not in _DEFAULT_PORTS:
+        return canonical
+    netloc = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    path = _path(parts.path, fold_index=True).rstrip("/")
+    query = _query(parts.query, sort=True)
+    return netloc + path + (f"?{query}" if query else "")
+
+
+def canonical_items(items: list) -> list:
+    """Search result items with their "link" canonicalized (copies, not in place)."""
+    return [
+        dict(item, link=canonical_url(item["link"])) if item.get("link") else item
+        for item in items
+    ]
@@ -23,6 +23,15 @@ variable "google_cx" {
   sensitive   = true
 }
 
+# Agent Lambdas deployed from the main stack that use this role to invoke
+# themselves (checkpoint re-invocation) or a fan-out worker, e.g. the
+# dispatcher and the function FANOUT_WORKER_FUNCTION names
+variable "agent_function_names" {
+  description = "Names of the agent Lambda functions the shared role may invoke"
+  type        = list(string)
+  default     = []
+}
+
 # OpenAI API key
 variable "openai_api_key" {
   description = "OpenAI API key"